@@ -0,0 +1,116 @@
+from BoardGenerator import BoardGenerator
+from Corpus import CorpusReader
+from Solvers import Solver, solve_batch
+from copy import deepcopy
+from statistics import median
+import argparse
+import subprocess
+import sys
+
+
+class Benchmark:
+    """
+    Times the solvers on randomly generated boards of several sizes, or on the first boards of a corpus file.
+    The boards are generated from a fixed seed, so every run (and every solver) sees the same boards
+    """
+
+    DEFAULT_SIZES = [9, 16, 25]
+    DEFAULT_SOLVERS = [Solver.MRV_SOLVER]
+    DEFAULT_COUNT = 3
+    DEFAULT_CLUE_RATIO = 0.6
+    STARTUP_MODULES = ['Board', 'Solvers', 'Corpus', 'SolutionStore', 'Rater', 'Game']
+    STARTUP_REPEATS = 5
+
+    def __init__(self, sizes=None, solver_names=None, count=DEFAULT_COUNT, clue_ratio=DEFAULT_CLUE_RATIO, seed=0, corpus_path=None):
+        self.corpus_path = corpus_path
+        self.sizes = sizes or Benchmark.DEFAULT_SIZES
+        self.solver_names = solver_names or Benchmark.DEFAULT_SOLVERS
+        self.count = count
+        self.clue_ratio = clue_ratio
+        self.seed = seed
+
+    def generate_boards(self, size):
+        """Returns the list of boards used to benchmark the given board size"""
+        generator = BoardGenerator((size, size), clue_ratio=self.clue_ratio, seed=self.seed)
+        return [generator.generate_new_board() for _ in range(self.count)]
+
+    @staticmethod
+    def time_solver(solver_name, boards):
+        """
+        Solves every board with the given solver
+        :return: A (total seconds, number solved, total steps) triplet
+        """
+        total_time, solved, steps = 0, 0, 0
+        for solver in solve_batch((deepcopy(board) for board in boards), solver_name):
+            total_time += solver.get_time_used_to_solve()
+            solved += solver.was_solved()
+            steps += len(solver.get_steps())
+        return total_time, solved, steps
+
+    def read_corpus_boards(self):
+        """Returns the first self.count boards of the corpus file"""
+        with CorpusReader(self.corpus_path) as corpus:
+            return corpus[:self.count]
+
+    def get_board_sets(self):
+        """Returns a list of (size, boards) pairs to benchmark"""
+        if self.corpus_path:
+            boards = self.read_corpus_boards()
+            return [(boards[0].height if boards else 0, boards)]
+        return [(size, self.generate_boards(size)) for size in self.sizes]
+
+    @staticmethod
+    def time_import(module, repeats=STARTUP_REPEATS):
+        """
+        Measures how long importing a module takes in a fresh interpreter, using python -X importtime
+        :return: A (median milliseconds, whether pygame was imported) pair
+        """
+        times, loads_pygame = [], False
+        for _ in range(repeats):
+            result = subprocess.run(
+                [sys.executable, '-X', 'importtime', '-c', f'import sys, {module}; print("pygame" in sys.modules)'],
+                capture_output=True, text=True, check=True
+            )
+            # Every line of the report reads 'import time: self | cumulative | name', in microseconds
+            for line in result.stderr.splitlines():
+                fields = line.split('|')
+                if len(fields) == 3 and fields[2].strip() == module:
+                    times.append(int(fields[1]) / 1000)
+            loads_pygame = result.stdout.strip() == 'True'
+        return median(times), loads_pygame
+
+    @staticmethod
+    def run_startup(modules=None, repeats=STARTUP_REPEATS):
+        """Prints the import time of every module, and whether importing it loads pygame"""
+        print(f'{"module":>14} {"import ms":>10} {"pygame":>7}')
+        for module in modules or Benchmark.STARTUP_MODULES:
+            milliseconds, loads_pygame = Benchmark.time_import(module, repeats)
+            print(f'{module:>14} {milliseconds:>10.2f} {"yes" if loads_pygame else "no":>7}', flush=True)
+
+    def run(self):
+        """Runs the benchmark and prints one line of results per (size, solver) pair"""
+        print(f'{"size":>6} {"solver":>14} {"solved":>8} {"avg seconds":>12} {"avg steps":>10}')
+        for size, boards in self.get_board_sets():
+            if not boards:
+                continue
+            for solver_name in self.solver_names:
+                total_time, solved, steps = Benchmark.time_solver(solver_name, boards)
+                print(f'{f"{size}x{size}":>6} {solver_name:>14} {f"{solved}/{len(boards)}":>8} '
+                      f'{total_time / len(boards):>12.4f} {steps // len(boards):>10}', flush=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser('Benchmark the solvers on generated boards')
+    parser.add_argument('--sizes', nargs='+', type=int, dest='sizes', default=Benchmark.DEFAULT_SIZES)
+    parser.add_argument('-s', '--solvers', nargs='+', choices=Solver.SOLVERS, dest='solvers', default=Benchmark.DEFAULT_SOLVERS)
+    parser.add_argument('-n', '--count', type=int, dest='count', default=Benchmark.DEFAULT_COUNT)
+    parser.add_argument('--clue-ratio', type=float, dest='clue_ratio', default=Benchmark.DEFAULT_CLUE_RATIO)
+    parser.add_argument('--seed', type=int, dest='seed', default=0)
+    parser.add_argument('--corpus', type=str, dest='corpus', default=None, help='Benchmark the first boards of this corpus file instead')
+    parser.add_argument('--startup', action='store_true', dest='startup', help='Measure the import time of the modules instead')
+    args = parser.parse_args()
+
+    if args.startup:
+        Benchmark.run_startup()
+    else:
+        Benchmark(args.sizes, args.solvers, args.count, args.clue_ratio, args.seed, args.corpus).run()
@@ -1,18 +1,35 @@
-from math import sqrt
-from copy import deepcopy
+from Geometry import get_geometry
+from hashlib import blake2b
 
 
 class Board:
+    """
+    A Sudoku board. The numbers are stored in one flat bytearray, indexed by row * width + col, next to an immutable
+    bytes copy of the initial clues which is shared between copies of the board. The per-unit counts of every number
+    are kept up to date as moves are applied, so legality and conflict checks run in O(1).
+    The board[row][col] and initial_board[row][col] style of access is still supported through BoardView.
+    A listener can be set to be told about every change to the board (see HintEngine); copies start without one
+    """
+
+    __slots__ = ('geometry', 'height', 'width', 'mini_box_height', 'mini_box_width', 'valid_nums',
+                 'cells', 'initial_cells', 'unit_counts', 'unit_masks', 'conflicts', 'empty_cells',
+                 'listener', '__view', '__initial_view')
 
     ERROR = -1
 
-    def __init__(self, size=(9, 9)):
-        self.height, self.width = size
-        self.board = self.__init_board()
-        self.initial_board = deepcopy(self.board)
-        self.mini_box_height = int(sqrt(self.height))
-        self.mini_box_width = int(sqrt(self.width))
-        self.valid_nums = [num for num in range(1, self.mini_box_width * self.mini_box_height + 1)]
+    def __init__(self, size=(9, 9), box_size=None, variants=None):
+        """
+        :param size: The (height, width) of the board
+        :param box_size: The (height, width) of the mini boxes. Defaults to the most square shape, e.g. 2x3 for a 6x6 board
+        :param variants: An optional Variants object declaring the extra constraints of a Sudoku variant (see Geometry)
+        """
+        self.__set_geometry(get_geometry(size, box_size, variants))
+        self.cells = bytearray(self.geometry.num_cells)
+        self.initial_cells = bytes(self.cells)
+        self.unit_counts = bytearray()  # unit_counts[offset + num] is the number of times num appears in a unit (see Geometry.count_offsets)
+        self.unit_masks = []  # Bit num of unit_masks[unit] is set iff num appears in the unit
+        self.conflicts = 0  # The number of repeated numbers summed over all rows, columns and mini boxes
+        self.empty_cells = 0
         default_board = [
             [0, 0, 0, 0, 0, 0, 0, 0, 0],
             [0, 3, 0, 0, 0, 0, 1, 6, 0],
@@ -35,17 +52,82 @@ class Board:
         #     [7, 2, 6, 3, 5, 8, 4, 9, 1],
         #     [9, 5, 3, 7, 1, 4, 6, 2, 0]
         # ]
-        self.set_board(default_board)
+        if self.geometry.get_shape() == (9, 9, 3, 3) and self.geometry.variants is None:
+            self.set_board(default_board)
+        else:
+            self.set_board(self.board)
+
+    @classmethod
+    def from_cells(cls, cells, geometry):
+        """
+        Creates a board directly from a flat sequence of numbers (row by row) which are all treated as initial clues
+        :param cells: A bytes-like object or sequence of ints of length geometry.num_cells
+        :param geometry: The board's Geometry (see get_geometry())
+        """
+        board = cls.__new__(cls)
+        board.__setstate__((geometry, cells, bytes(cells)))
+        return board
+
+    def __set_geometry(self, geometry):
+        """Sets the geometry along with all of the attributes derived from it"""
+        self.geometry = geometry
+        self.height, self.width = geometry.height, geometry.width
+        self.mini_box_height, self.mini_box_width = geometry.box_height, geometry.box_width
+        self.valid_nums = geometry.valid_nums
+        self.listener = None  # Called as listener(index, old_num) after a cell changes, or listener(None, None) after every cell may have
+        self.__view = None
+        self.__initial_view = None
+
+    @property
+    def board(self):
+        """A 2D view of the board. Assigning board[row][col] updates the cell and its counts"""
+        if self.__view is None:
+            self.__view = BoardView(self, self.cells)
+        return self.__view
+
+    @property
+    def initial_board(self):
+        """A read-only 2D view of the initial board"""
+        if self.__initial_view is None:
+            self.__initial_view = BoardView(None, self.initial_cells, self.width)
+        return self.__initial_view
+
+    def __copy__(self):
+        """Copies the board. Only the cells and the counts are copied; the geometry and initial clues are shared"""
+        other = Board.__new__(Board)
+        other.__set_geometry(self.geometry)
+        other.cells = bytearray(self.cells)
+        other.initial_cells = self.initial_cells
+        other.unit_counts = bytearray(self.unit_counts)
+        other.unit_masks = self.unit_masks.copy()
+        other.conflicts = self.conflicts
+        other.empty_cells = self.empty_cells
+        return other
+
+    def __deepcopy__(self, memo):
+        return self.__copy__()
+
+    def __getstate__(self):
+        return self.geometry, bytes(self.cells), self.initial_cells
+
+    def __setstate__(self, state):
+        geometry, cells, initial_cells = state
+        self.__set_geometry(geometry)
+        self.cells = bytearray(cells)
+        self.initial_cells = initial_cells
+        self.__init_counts()
 
     def __str__(self):
         output = ''
+        num_width = len(str(len(self.valid_nums)))
+        line_length = self.width * (num_width + 1) + 2 * (self.width // self.mini_box_width - 1)
         for row in range(self.height):
             if row % self.mini_box_height == 0 and row > 0:
-                output += ' - ' * (self.width - 2) + '\n'
+                output += ' - ' * (line_length // 3) + '\n'
             for col in range(self.width):
                 if col % self.mini_box_width == 0 and col > 0:
                     output += '| '
-                output += str(self.board[row][col])
+                output += str(self.cells[row * self.width + col]).rjust(num_width)
                 output += ' '
             output += '\n'
         return output
@@ -53,38 +135,113 @@ class Board:
     def is_legal(self, row, col, num, check_occupied=False):
         """
         Given the cell coordinates and attempted number, returns whether or not
-        the number can legally be placed there. Does not account for if the desired cell is already occupied
+        the number can legally be placed there. Does not account for if the desired cell is already occupied.
+        Runs in O(1) using the per-unit counts
         :param row: The row
         :param col: The column
         :param num: The number
         :return: True iff legal placement
         """
-        if check_occupied and self.board[row][col] != 0:
+        index = row * self.width + col
+        current = self.cells[index]
+        if check_occupied and current != 0:
             return False
 
-        # Check the rest of the row
-        for other_col_coordinate in range(self.width):
-            if other_col_coordinate != col and self.board[row][other_col_coordinate] == num:
-                # print(f'1 -- {(row, other_col_coordinate, num)} and {self.board[row][other_col_coordinate]}')
+        own = 1 if current == num else 0  # The cell itself should not count against the placement
+        unit_counts = self.unit_counts
+        for offset in self.geometry.count_offsets[index]:
+            if unit_counts[offset + num] != own:
                 return False
-
-        # Check the rest of the column
-        for other_row_coordinate in range(self.height):
-            if other_row_coordinate != row and self.board[other_row_coordinate][col] == num:
-                # print(f'2 -- {(other_row_coordinate, col, num)} and {self.board[other_row_coordinate][col]}')
+        for cage in self.geometry.cell_cages[index]:
+            if self.__get_cage_mask(cage, current) | 1 << num not in self.geometry.cage_subsets[cage]:
                 return False
+        return True
 
-        # Check the mini box that the cell resides in
-        col_shift = col // self.mini_box_width
-        row_shift = row // self.mini_box_height
+    def __get_cage_mask(self, cage, current):
+        """Returns the bitmask of the numbers in a cage, leaving out the number current of the cell being checked"""
+        mask = self.unit_masks[cage]
+        if current != 0 and self.unit_counts[cage * self.geometry.count_stride + current] == 1:
+            mask &= ~(1 << current)
+        return mask
 
-        for _row in range(self.mini_box_height):
-            for _col in range(self.mini_box_width):
-                if (_row != row or _col != col) and self.board[row_shift * self.mini_box_height + _row][col_shift * self.mini_box_width + _col] == num:
-                    # print(f'3 -- {(_row, _col, num)} and {self.board[_row][_col]}')
-                    return False
+    def get_box_index(self, row, col):
+        """Returns the index of the mini box the cell resides in. Boxes are numbered left to right, top to bottom"""
+        return self.geometry.box_index(row, col)
 
-        return True
+    def is_conflicting(self, row, col):
+        """Returns True iff the number in the given cell also appears elsewhere in its row, column or mini box"""
+        index = row * self.width + col
+        num = self.cells[index]
+        if num == 0:
+            return False
+        for offset in self.geometry.count_offsets[index]:
+            if self.unit_counts[offset + num] > 1:
+                return True
+        return False
+
+    def get_conflicting_cells(self):
+        """Returns a list of all (row, col) cells whose number is repeated in one of its units"""
+        if self.conflicts == 0:
+            return []
+        return [(row, col) for row in range(self.height) for col in range(self.width) if self.is_conflicting(row, col)]
+
+    def __count_num(self, index, num, delta):
+        """Adds delta (+1 or -1) to the counts of num in all units containing the given cell"""
+        if num == 0:
+            self.empty_cells += delta
+            for offset in self.geometry.count_offsets[index]:
+                self.unit_counts[offset] += delta
+            return
+        unit_counts = self.unit_counts
+        stride = self.geometry.count_stride
+        bit = 1 << num
+        for offset in self.geometry.count_offsets[index]:
+            count = unit_counts[offset + num]
+            # A repeat is created when adding to a non-empty unit, and removed when taking from a repeated one
+            if delta > 0:
+                if count >= 1:
+                    self.conflicts += 1
+                else:
+                    self.unit_masks[offset // stride] |= bit
+            else:
+                if count >= 2:
+                    self.conflicts -= 1
+                else:
+                    self.unit_masks[offset // stride] &= ~bit
+            unit_counts[offset + num] = count + delta
+
+    def __init_counts(self):
+        """Recalculates all of the per-unit counts from scratch. Should be called whenever self.cells is replaced"""
+        stride = self.geometry.count_stride
+        unit_counts = bytearray(len(self.geometry.units) * stride)
+        for offsets, num in zip(self.geometry.count_offsets, self.cells):
+            for offset in offsets:
+                unit_counts[offset + num] += 1
+
+        self.unit_counts = unit_counts
+        self.unit_masks = [0] * len(self.geometry.units)
+        self.conflicts = 0
+        for unit in range(len(self.geometry.units)):
+            mask = 0
+            for num in self.valid_nums:
+                count = unit_counts[unit * stride + num]
+                if count:
+                    mask |= 1 << num
+                    self.conflicts += count - 1
+            self.unit_masks[unit] = mask
+        self.empty_cells = self.cells.count(0)
+        if self.listener is not None:
+            self.listener(None, None)
+
+    def set_cell(self, row, col, num):
+        """Sets the given cell, keeping the counts up to date. Unlike apply_move, does not protect the initial clues"""
+        index = row * self.width + col
+        old_num = self.cells[index]
+        self.__count_num(index, old_num, -1)
+        self.cells[index] = num
+        self.__count_num(index, num, 1)
+        if self.listener is not None:
+            self.listener(index, old_num)
 
     def apply_move(self, row, col, num):
         """
@@ -99,9 +256,9 @@ class Board:
         """
         if 0 <= row < self.height \
                 and 0 <= col < self.width \
-                and (num in self.valid_nums or num == 0) \
-                and self.initial_board[row][col] == 0:
-            self.board[row][col] = num
+                and 0 <= num <= len(self.valid_nums) \
+                and self.initial_cells[row * self.width + col] == 0:
+            self.set_cell(row, col, num)
             return True
         return False
 
@@ -111,36 +268,51 @@ class Board:
 
     def find_empty_cell(self):
         """Returns an empty cell in the board. If none exist, return (Board.ERROR, Board.ERROR)"""
-        for row in range(self.height):
-            for col in range(self.width):
-                if self.board[row][col] == 0:
-                    return row, col
-        return Board.ERROR, Board.ERROR
-
-    def __init_board(self):
-        """Initializes a board"""
-        board = []
-        for row in range(self.height):
-            new_row = []
-            for col in range(self.width):
-                new_row.append(0)
-            board.append(new_row)
-        return board
+        index = self.cells.find(0)
+        if index == -1:
+            return Board.ERROR, Board.ERROR
+        return divmod(index, self.width)
 
     def set_board(self, board):
         """Sets the board to the given board (a 2D array). Does not check for validity
         and does not update other internal variables connected to the board.
         Useful only for setting the board before the game begins"""
-        self.board = board
-        self.initial_board = deepcopy(self.board)
+        self.cells[:] = bytes(num for row in board for num in row)
+        self.initial_cells = bytes(self.cells)
+        self.__initial_view = None
+        self.__init_counts()
+
+    def set_cells(self, cells):
+        """Replaces the current numbers with the given flat sequence of numbers, keeping the initial clues"""
+        self.cells[:] = bytes(cells)
+        self.__init_counts()
+
+    def fingerprint(self):
+        """Returns a 16 byte digest identifying the board's shape, variant constraints and current numbers"""
+        variants = repr(self.geometry.variants).encode() if self.geometry.variants is not None else b''
+        return blake2b(bytes(self.geometry.get_shape()) + self.cells + variants, digest_size=16).digest()
 
     def valid_complete_board(self):
         """Returns True iff the board has been solved"""
-        for row in range(self.height):
-            for col in range(self.width):
-                if not self.is_legal(row, col, self.board[row][col]):
-                    return False
-        return True
+        if self.empty_cells != 0 or self.conflicts != 0:
+            return False
+        return all(self.unit_masks[cage] in combos for cage, combos in self.geometry.cage_combinations.items())
+
+    def get_candidate_mask(self, index):
+        """
+        Returns the bitmask of the numbers which can legally be placed in the empty cell at the given flat index.
+        Bit num is set iff num is legal
+        """
+        used = 0
+        for unit in self.geometry.cell_units[index]:
+            used |= self.unit_masks[unit]
+        mask = self.geometry.full_mask & ~used
+        for cage in self.geometry.cell_cages[index]:
+            cage_mask, subsets = self.unit_masks[cage], self.geometry.cage_subsets[cage]
+            for num in self.valid_nums:
+                if mask >> num & 1 and cage_mask | 1 << num not in subsets:
+                    mask &= ~(1 << num)
+        return mask
 
     def get_legal_nums_for_cell(self, row, col):
         """
@@ -149,11 +321,85 @@ class Board:
         :param col: Column of the desired cell
         :return: A list of ints of possible values
         """
-        return [num for num in self.valid_nums if self.is_legal(row, col, num, check_occupied=True)]
+        index = row * self.width + col
+        if self.cells[index] != 0:
+            return []
+        mask = self.get_candidate_mask(index)
+        return [num for num in self.valid_nums if mask >> num & 1]
 
     def reset_board(self):
         """Resets the board to the original layout"""
-        self.board = self.initial_board
+        self.cells[:] = self.initial_cells
+        self.__init_counts()
+
+
+class BoardView:
+    """
+    Presents a flat cell store as a 2D array so that board[row][col] keeps working.
+    When the view belongs to a board, assigning to a cell goes through Board.set_cell; a view without a board is read-only
+    """
+
+    __slots__ = ('rows',)
+
+    def __init__(self, board, cells, width=None):
+        width = board.width if board is not None else width
+        self.rows = tuple(RowView(board, cells, row, width) for row in range(len(cells) // width))
+
+    def __getitem__(self, row):
+        return self.rows[row]
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __eq__(self, other):
+        return len(self) == len(other) and all(row == other_row for row, other_row in zip(self, other))
+
+    def tolist(self):
+        """Returns a copy of the view as a 2D list"""
+        return [list(row) for row in self.rows]
+
+
+class RowView:
+    """A single row of a BoardView"""
+
+    __slots__ = ('board', 'cells', 'row', 'offset', 'width')
+
+    def __init__(self, board, cells, row, width):
+        self.board = board
+        self.cells = cells
+        self.row = row
+        self.offset = row * width
+        self.width = width
+
+    def __getitem__(self, col):
+        if isinstance(col, slice):
+            return list(self.cells[self.offset:self.offset + self.width][col])
+        if col < 0:
+            col += self.width
+        if not 0 <= col < self.width:
+            raise IndexError('column index out of range')
+        return self.cells[self.offset + col]
+
+    def __setitem__(self, col, num):
+        if self.board is None:
+            raise TypeError('This view of the board is read-only')
+        if not 0 <= col < self.width:
+            raise IndexError('column index out of range')
+        if not 0 <= num <= len(self.board.valid_nums):  # A larger num would be counted in the next unit's slots
+            raise ValueError(f'{num} is not a valid number for a {self.board.height}x{self.board.width} board')
+        self.board.set_cell(self.row, col, num)
+
+    def __len__(self):
+        return self.width
+
+    def __iter__(self):
+        return iter(self.cells[self.offset:self.offset + self.width])
+
+    def __eq__(self, other):
+        return list(self) == list(other)
 
 
 if __name__ == '__main__':
@@ -1,7 +1,5 @@
-from typing import List
-
 from Board import Board
-from random import randint
+from random import Random
 
 
 class BoardGenerator:
@@ -11,16 +9,49 @@ class BoardGenerator:
     can be called to continue producing new Board objects
     """
 
-    def __init__(self, size=(9, 9)):
+    DEFAULT_CLUE_RATIO = 0.5
+
+    def __init__(self, size=(9, 9), box_size=None, clue_ratio=DEFAULT_CLUE_RATIO, seed=None):
+        """
+        :param size: The (height, width) of the generated boards
+        :param box_size: The (height, width) of the mini boxes. See Board
+        :param clue_ratio: The fraction of cells that are left filled in
+        :param seed: Seeds the random number generator so that the same boards are generated on every run
+        """
         self.height, self.width = size
+        self.box_size = box_size
+        self.clue_ratio = clue_ratio
+        self.random = Random(seed)
 
     def generate_new_board(self) -> Board:
         """When called, will return a new Board object containing an unsolved Sudoku grid"""
-        board_object = Board((self.height, self.width))
+        board_object = Board((self.height, self.width), self.box_size)
         new_board = self.create_empty_board(board_object)
         board_object.set_board(new_board)
         return board_object
 
-    def create_empty_board(self, board: Board) -> List[List[int]]:
-        """Used to create a 2D python array containing the board info"""
-        pass
+    def create_empty_board(self, board: Board) -> list[list[int]]:
+        """
+        Used to create a 2D python array containing the board info.
+        A full grid is built from a valid pattern, shuffled in ways that keep it valid, and then cells are cleared.
+        The board is guaranteed to be solvable, but the solution is not guaranteed to be unique
+        """
+        size = len(board.valid_nums)
+        box_height, box_width = board.mini_box_height, board.mini_box_width
+
+        # Shuffle the rows within each band and the order of the bands, and likewise for the columns within each stack
+        bands = self.random.sample(range(size // box_height), size // box_height)
+        rows = [band * box_height + row for band in bands for row in self.random.sample(range(box_height), box_height)]
+        stacks = self.random.sample(range(size // box_width), size // box_width)
+        cols = [stack * box_width + col for stack in stacks for col in self.random.sample(range(box_width), box_width)]
+        nums = self.random.sample(board.valid_nums, size)
+
+        def pattern(row, col):
+            return (box_width * (row % box_height) + row // box_height + col) % size
+
+        new_board = [[nums[pattern(row, col)] for col in cols] for row in rows]
+
+        num_to_clear = self.height * self.width - round(self.height * self.width * self.clue_ratio)
+        for cell in self.random.sample(range(self.height * self.width), num_to_clear):
+            new_board[cell // self.width][cell % self.width] = 0
+        return new_board
@@ -0,0 +1,312 @@
+from heapq import heapify, heappush, heappop
+
+
+class CDCL:
+    """
+    A conflict-driven clause learning SAT solver written in pure Python.
+    Clauses are given in DIMACS style, as lists of non-zero ints where v means variable v is true and -v means it is
+    false. The solver uses two watched literals for unit propagation, learns a first-UIP clause at every conflict,
+    picks decisions with VSIDS activities and saved phases, restarts on a geometric schedule and periodically
+    forgets the learned clauses with the worst literal block distance (LBD).
+
+    Internally, variable v has the literals 2v (true) and 2v + 1 (false), so negating a literal is lit ^ 1
+    """
+
+    RESTART_BASE = 100  # The number of conflicts before the first restart
+    RESTART_GROWTH = 1.5
+    VAR_DECAY = 0.95
+    MIN_LEARNED_LIMIT = 2000  # Learned clauses are reduced once there are more than this (or a third of the clauses)
+    LEARNED_LIMIT_GROWTH = 1.1
+    KEEP_LBD = 2  # Learned clauses with an LBD this low are never forgotten
+
+    def __init__(self, num_vars):
+        self.num_vars = num_vars
+        self.values = [0] * (2 * num_vars + 2)  # values[lit] is 1 if the literal is true, -1 if false and 0 if unassigned
+        self.levels = [0] * (num_vars + 1)
+        self.reasons = [None] * (num_vars + 1)  # The clause which implied each variable, or None for decisions
+        self.trail = []  # Every assigned literal, in assignment order
+        self.trail_limits = []  # trail_limits[level - 1] is the trail length when that decision level started
+        self.queue_head = 0  # trail[queue_head:] still has to be propagated
+        self.watches = [[] for _ in range(2 * num_vars + 2)]  # watches[lit] holds the clauses watching lit
+        self.clauses = []
+        self.learned = []
+        self.learned_lbd = []
+        self.activity = [0.0] * (num_vars + 1)
+        self.bump_amount = 1.0
+        self.heap = [(0.0, var) for var in range(1, num_vars + 1)]  # A lazy max-heap of (-activity, var)
+        self.phases = bytearray(num_vars + 1)  # The last value of each variable, reused when it is decided on again
+        self.seen = bytearray(num_vars + 1)
+        self.ok = True  # False once the clauses are known to be unsatisfiable
+        self.decisions = 0
+        self.propagations = 0
+        self.conflicts = 0
+        self.restarts = 0
+        self.stop = None  # An optional callable, checked at every restart, which stops the search by returning True
+
+    def randomize(self, random, true_phase_probability=0.0):
+        """
+        Breaks the ties between variables of equal activity in a random order, and optionally starts some variables
+        with a saved phase of true. Without this, every run on the same clauses makes the same decisions.
+        Must be called before solve()
+        :param random: The Random object to draw from
+        :param true_phase_probability: The probability that a variable is first decided as true rather than false
+        """
+        self.activity = [random.random() * 1e-6 for _ in range(self.num_vars + 1)]  # Far smaller than any bump
+        self.heap = [(-self.activity[var], var) for var in range(1, self.num_vars + 1)]
+        heapify(self.heap)
+        self.phases = bytearray(random.random() < true_phase_probability for _ in range(self.num_vars + 1))
+
+    def get_stats(self):
+        """Returns a dict of the search statistics"""
+        return {
+            'decisions': self.decisions,
+            'propagations': self.propagations,
+            'conflicts': self.conflicts,
+            'restarts': self.restarts,
+            'learned': len(self.learned),
+        }
+
+    def decision_level(self):
+        return len(self.trail_limits)
+
+    def add_clause(self, clause):
+        """
+        Adds a clause, given as a list of DIMACS style ints. May be called between calls to solve(), e.g. to block a
+        model which broke a constraint that was not encoded. Returns False iff the clauses became unsatisfiable
+        """
+        if not self.ok:
+            return False
+        self.cancel_until(0)
+        lits = set()
+        for dimacs_lit in clause:
+            lit = 2 * dimacs_lit if dimacs_lit > 0 else -2 * dimacs_lit + 1
+            if lit ^ 1 in lits or self.values[lit] == 1:
+                return True  # Always satisfied
+            if self.values[lit] == 0:
+                lits.add(lit)
+        lits = list(lits)
+        if not lits:
+            self.ok = False
+        elif len(lits) == 1:
+            self.enqueue(lits[0], None)
+            self.ok = self.propagate() is None
+        else:
+            self.clauses.append(lits)
+            self.watches[lits[0]].append(lits)
+            self.watches[lits[1]].append(lits)
+        return self.ok
+
+    def enqueue(self, lit, reason):
+        """Makes the literal true at the current decision level"""
+        var = lit >> 1
+        self.values[lit] = 1
+        self.values[lit ^ 1] = -1
+        self.levels[var] = len(self.trail_limits)
+        self.reasons[var] = reason
+        self.trail.append(lit)
+
+    def propagate(self):
+        """Performs unit propagation on the trail. Returns a conflicting clause, or None if there is no conflict"""
+        values, watches, trail = self.values, self.watches, self.trail
+        level = len(self.trail_limits)
+        while self.queue_head < len(trail):
+            false_lit = trail[self.queue_head] ^ 1
+            self.queue_head += 1
+            self.propagations += 1
+            watchers = watches[false_lit]
+            i = j = 0
+            count = len(watchers)
+            while i < count:
+                clause = watchers[i]
+                i += 1
+                # Make sure the false literal is clause[1], so clause[0] is the other watched literal
+                if clause[0] == false_lit:
+                    clause[0], clause[1] = clause[1], false_lit
+                first = clause[0]
+                if values[first] == 1:
+                    watchers[j] = clause
+                    j += 1
+                    continue
+                for k in range(2, len(clause)):
+                    if values[clause[k]] != -1:  # Found a new literal to watch
+                        clause[1], clause[k] = clause[k], false_lit
+                        watches[clause[1]].append(clause)
+                        break
+                else:
+                    watchers[j] = clause
+                    j += 1
+                    if values[first] == -1:  # Every literal is false
+                        while i < count:
+                            watchers[j] = watchers[i]
+                            j += 1
+                            i += 1
+                        del watchers[j:]
+                        self.queue_head = len(trail)
+                        return clause
+                    # The clause is unit, so its first literal is implied
+                    var = first >> 1
+                    values[first] = 1
+                    values[first ^ 1] = -1
+                    self.levels[var] = level
+                    self.reasons[var] = clause
+                    trail.append(first)
+            del watchers[j:]
+        return None
+
+    def bump_var(self, var):
+        """Increases the activity of a variable involved in a conflict"""
+        self.activity[var] += self.bump_amount
+        if self.activity[var] > 1e100:  # Rescale everything before the floats overflow
+            self.activity = [activity * 1e-100 for activity in self.activity]
+            self.bump_amount *= 1e-100
+            self.heap = [(-self.activity[var], var) for var in range(1, self.num_vars + 1) if self.values[2 * var] == 0]
+            heapify(self.heap)
+        if self.values[2 * var] == 0:
+            heappush(self.heap, (-self.activity[var], var))
+
+    def analyze(self, conflict):
+        """
+        Derives the first-UIP learned clause from a conflict
+        :return: A (learned clause, backjump level) pair. The learned clause's first literal is the asserting literal
+        """
+        seen, levels, reasons, trail = self.seen, self.levels, self.reasons, self.trail
+        level = len(self.trail_limits)
+        learned = [0]
+        path_count = 0
+        index = len(trail) - 1
+        clause = conflict
+        start = 0
+        while True:
+            for k in range(start, len(clause)):
+                var = clause[k] >> 1
+                if not seen[var] and levels[var] > 0:
+                    seen[var] = 1
+                    self.bump_var(var)
+                    if levels[var] >= level:
+                        path_count += 1
+                    else:
+                        learned.append(clause[k])
+            while not seen[trail[index] >> 1]:
+                index -= 1
+            lit = trail[index]
+            index -= 1
+            var = lit >> 1
+            clause = reasons[var]
+            start = 1  # A reason clause's first literal is the literal it implied
+            seen[var] = 0
+            path_count -= 1
+            if path_count == 0:
+                break
+        learned[0] = lit ^ 1
+
+        # Drop literals implied by literals which are already in the clause
+        minimized = [learned[0]]
+        for lit in learned[1:]:
+            reason = reasons[lit >> 1]
+            if reason is None or any(not seen[other >> 1] and levels[other >> 1] > 0 for other in reason[1:]):
+                minimized.append(lit)
+        for lit in learned:
+            seen[lit >> 1] = 0
+
+        if len(minimized) == 1:
+            return minimized, 0
+        # Watch the literal with the highest level after the asserting one, so the clause works after backjumping
+        best = max(range(1, len(minimized)), key=lambda k: levels[minimized[k] >> 1])
+        minimized[1], minimized[best] = minimized[best], minimized[1]
+        return minimized, levels[minimized[1] >> 1]
+
+    def cancel_until(self, level):
+        """Undoes every assignment made above the given decision level"""
+        if len(self.trail_limits) <= level:
+            return
+        limit = self.trail_limits[level]
+        values, reasons, phases, activity, heap = self.values, self.reasons, self.phases, self.activity, self.heap
+        for lit in self.trail[limit:]:
+            var = lit >> 1
+            values[lit] = values[lit ^ 1] = 0
+            reasons[var] = None
+            phases[var] = 1 - (lit & 1)
+            heappush(heap, (-activity[var], var))
+        del self.trail[limit:]
+        del self.trail_limits[level:]
+        self.queue_head = limit
+
+    def pick_branch_lit(self):
+        """Returns the next decision literal, or None if every variable is assigned"""
+        values, heap = self.values, self.heap
+        while heap:
+            var = heappop(heap)[1]
+            if values[2 * var] == 0:
+                return 2 * var + 1 - self.phases[var]
+        return None
+
+    def reduce_learned(self):
+        """Forgets the half of the learned clauses with the worst LBD. Must be called at decision level 0"""
+        order = sorted(range(len(self.learned)), key=lambda k: self.learned_lbd[k])
+        keep = set(order[:len(order) // 2])
+        keep.update(k for k in order if self.learned_lbd[k] <= CDCL.KEEP_LBD)
+        forgotten = {id(self.learned[k]) for k in range(len(self.learned)) if k not in keep}
+        self.learned = [self.learned[k] for k in sorted(keep)]
+        self.learned_lbd = [self.learned_lbd[k] for k in sorted(keep)]
+        for watchers in self.watches:
+            if watchers:
+                watchers[:] = [clause for clause in watchers if id(clause) not in forgotten]
+
+    def solve(self):
+        """
+        Searches for a satisfying assignment. Can be called again after add_clause()
+        :return: True if satisfiable, False if unsatisfiable, or None if stopped through self.stop
+        """
+        if not self.ok:
+            return False
+        self.cancel_until(0)
+        if self.propagate() is not None:
+            self.ok = False
+            return False
+
+        restart_limit = CDCL.RESTART_BASE
+        learned_limit = max(CDCL.MIN_LEARNED_LIMIT, len(self.clauses) // 3)
+        conflicts_since_restart = 0
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+                self.conflicts += 1
+                conflicts_since_restart += 1
+                if not self.trail_limits:
+                    self.ok = False
+                    return False
+                learned, backjump_level = self.analyze(conflict)
+                self.cancel_until(backjump_level)
+                if len(learned) == 1:
+                    self.enqueue(learned[0], None)
+                else:
+                    self.learned.append(learned)
+                    self.learned_lbd.append(len({self.levels[lit >> 1] for lit in learned}))
+                    self.watches[learned[0]].append(learned)
+                    self.watches[learned[1]].append(learned)
+                    self.enqueue(learned[0], learned)
+                self.bump_amount /= CDCL.VAR_DECAY
+                continue
+
+            if conflicts_since_restart >= restart_limit:
+                self.restarts += 1
+                conflicts_since_restart = 0
+                restart_limit *= CDCL.RESTART_GROWTH
+                self.cancel_until(0)
+                if self.stop is not None and self.stop():
+                    return None
+                if len(self.learned) > learned_limit:
+                    self.reduce_learned()
+                    learned_limit *= CDCL.LEARNED_LIMIT_GROWTH
+                continue
+
+            lit = self.pick_branch_lit()
+            if lit is None:
+                return True
+            self.decisions += 1
+            self.trail_limits.append(len(self.trail))
+            self.enqueue(lit, None)
+
+    def get_model(self):
+        """Returns the set of variables which are true in the satisfying assignment found by solve()"""
+        return {var for var in range(1, self.num_vars + 1) if self.values[2 * var] == 1}
@@ -0,0 +1,109 @@
+from Geometry import Variants, get_geometry
+from collections import namedtuple
+import json
+import os
+import struct
+
+
+# The search state of a Solver. See Solver.get_checkpoint_state() for the meaning of each field
+CheckpointState = namedtuple('CheckpointState', [
+    'solver_class', 'geometry', 'initial_cells', 'start_cells', 'cells', 'legal_values', 'frames',
+    'nodes', 'pruned', 'time_used', 'learning', 'random_state',
+])
+
+
+class Checkpoint:
+    """
+    Describes the binary checkpoint format, which holds everything needed to resume a search exactly where it stopped.
+    A checkpoint is a fixed size header followed by variable size sections, all little endian:
+        header: magic (4s) | version (H) | height (B) | width (B) | box_height (B) | box_width (B) |
+                solver class name length (B) | flags (B) | nodes (Q) | pruned (Q) | time_used (d) |
+                legal value count (I) | frame count (I) | variants length (I)
+        the solver class name, in ASCII
+        the board's Variants as JSON, or nothing for plain Sudoku
+        the initial clues, the numbers the search started from, and the current numbers: one byte per cell each
+        legal values: the cell indices (I each), then the candidate bitmasks (Q each), in the solver's dict order
+        frames: the cell indices (I each), the positions of the values being tried (H each), the value counts
+                (H each), then all of the values, one byte each
+        random state: the count (I), then the Mersenne Twister state words (I each)
+    """
+
+    MAGIC = b'SDKP'
+    VERSION = 2
+    HEADER_FORMAT = '<4sHBBBBBBQQdIII'
+    HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+    LEARNING_FLAG = 1
+    RANDOM_FLAG = 2
+    LEGAL_VALUES_FLAG = 4
+
+    @staticmethod
+    def write(path, state):
+        """Writes the CheckpointState to a file. The file is replaced atomically, so a crash never leaves a partial checkpoint"""
+        flags = (Checkpoint.LEARNING_FLAG * state.learning
+                 | Checkpoint.RANDOM_FLAG * (state.random_state is not None)
+                 | Checkpoint.LEGAL_VALUES_FLAG * (state.legal_values is not None))
+        name = state.solver_class.encode('ascii')
+        variants = state.geometry.variants
+        variants = json.dumps(variants._asdict()).encode() if variants is not None else b''
+        legal_values = state.legal_values or []
+        frames = state.frames
+        parts = [
+            struct.pack(Checkpoint.HEADER_FORMAT, Checkpoint.MAGIC, Checkpoint.VERSION, *state.geometry.get_shape(),
+                        len(name), flags, state.nodes, state.pruned, state.time_used, len(legal_values), len(frames),
+                        len(variants)),
+            name,
+            variants,
+            bytes(state.initial_cells),
+            bytes(state.start_cells),
+            bytes(state.cells),
+            struct.pack(f'<{len(legal_values)}I', *(index for index, _ in legal_values)),
+            struct.pack(f'<{len(legal_values)}Q', *(mask for _, mask in legal_values)),
+            struct.pack(f'<{len(frames)}I', *(index for index, _, _ in frames)),
+            struct.pack(f'<{len(frames)}H', *(position for _, position, _ in frames)),
+            struct.pack(f'<{len(frames)}H', *(len(values) for _, _, values in frames)),
+            b''.join(bytes(values) for _, _, values in frames),
+        ]
+        if state.random_state is not None:
+            parts.append(struct.pack(f'<I{len(state.random_state)}I', len(state.random_state), *state.random_state))
+
+        temp_path = f'{path}.tmp'
+        with open(temp_path, 'wb') as checkpoint_file:
+            checkpoint_file.write(b''.join(parts))
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+        os.replace(temp_path, path)
+
+    @staticmethod
+    def read(path):
+        """Reads a file written by Checkpoint.write() and returns its CheckpointState"""
+        with open(path, 'rb') as checkpoint_file:
+            data = checkpoint_file.read()
+        magic, version, height, width, box_height, box_width, name_length, flags, nodes, pruned, time_used, \
+            legal_count, frame_count, variants_length = struct.unpack_from(Checkpoint.HEADER_FORMAT, data)
+        if magic != Checkpoint.MAGIC:
+            raise ValueError(f'{path} is not a solver checkpoint')
+        if version != Checkpoint.VERSION:
+            raise ValueError(f'{path} uses checkpoint version {version}, but only version {Checkpoint.VERSION} is supported')
+        offset = Checkpoint.HEADER_SIZE
+
+        def take(size):
+            nonlocal offset
+            offset += size
+            return data[offset - size:offset]
+
+        def take_ints(code, count):
+            return struct.unpack(f'<{count}{code}', take(count * struct.calcsize(code)))
+
+        solver_class = take(name_length).decode('ascii')
+        variants = Variants(**json.loads(take(variants_length))) if variants_length else None
+        geometry = get_geometry((height, width), (box_height, box_width), variants)
+        initial_cells, start_cells, cells = take(geometry.num_cells), take(geometry.num_cells), take(geometry.num_cells)
+        legal_values = list(zip(take_ints('I', legal_count), take_ints('Q', legal_count)))
+        frame_cells, positions, counts = take_ints('I', frame_count), take_ints('H', frame_count), take_ints('H', frame_count)
+        frames = [(index, position, take(count)) for index, position, count in zip(frame_cells, positions, counts)]
+        random_state = take_ints('I', take_ints('I', 1)[0]) if flags & Checkpoint.RANDOM_FLAG else None
+
+        return CheckpointState(solver_class, geometry, initial_cells, start_cells, cells,
+                               legal_values if flags & Checkpoint.LEGAL_VALUES_FLAG else None, frames,
+                               nodes, pruned, time_used, bool(flags & Checkpoint.LEARNING_FLAG), random_state)
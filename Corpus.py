@@ -0,0 +1,225 @@
+from Board import Board
+from Geometry import get_geometry
+import argparse
+import mmap
+import struct
+
+
+class Corpus:
+    """
+    Describes the binary puzzle corpus format.
+    A corpus file is a fixed size header followed by the puzzles, one fixed size record each, so the
+    record of puzzle i always starts at HEADER_SIZE + i * record_size. Every cell is packed into 4 bits when
+    the numbers fit (boards up to 15x15), and 5 bits otherwise, with 0 marking an empty cell.
+    Cells are packed little end first: in the 4 bit layout, cell 2i is the low nibble of byte i.
+
+    Header layout (little endian):
+        magic (4s) | version (H) | height (B) | width (B) | box_height (B) | box_width (B) | bits_per_cell (B) |
+        padding (x) | count (Q) | record_size (I) | reserved (8x)
+    """
+
+    MAGIC = b'SDKC'
+    VERSION = 1
+    HEADER_FORMAT = '<4sHBBBBBxQI8x'
+    HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+    COUNT_OFFSET = struct.calcsize('<4sHBBBBBx')
+    EMPTY_CHARS = '.0'
+
+    # Translation tables which split every byte of a 4 bit record into its low and high nibble
+    LOW_NIBBLES = bytes(byte & 0xF for byte in range(256))
+    HIGH_NIBBLES = bytes(byte >> 4 for byte in range(256))
+
+    @staticmethod
+    def get_bits_per_cell(geometry):
+        """Returns the number of bits used to store each cell of a board with the given geometry"""
+        size = len(geometry.valid_nums)
+        if size < 16:
+            return 4
+        if size < 32:
+            return 5
+        raise ValueError(f'Boards with more than 31 numbers are not supported by the corpus format, got {size}')
+
+    @staticmethod
+    def get_record_size(geometry):
+        """Returns the number of bytes used to store one board with the given geometry"""
+        return (geometry.num_cells * Corpus.get_bits_per_cell(geometry) + 7) // 8
+
+    @staticmethod
+    def pack(cells, bits_per_cell, record_size):
+        """Packs a flat sequence of cells into a record"""
+        if bits_per_cell == 4:
+            padded = bytes(cells) + b'\0' * (len(cells) % 2)
+            return bytes(low | high << 4 for low, high in zip(padded[0::2], padded[1::2])).ljust(record_size, b'\0')
+        packed = 0
+        for num in reversed(cells):
+            packed = packed << bits_per_cell | num
+        return packed.to_bytes(record_size, 'little')
+
+    @staticmethod
+    def unpack(record, bits_per_cell, num_cells):
+        """Unpacks a record into a bytearray of num_cells cells"""
+        cells = bytearray(num_cells)
+        if bits_per_cell == 4:
+            record = bytes(record[:(num_cells + 1) // 2])
+            cells[0::2] = record.translate(Corpus.LOW_NIBBLES)[:(num_cells + 1) // 2]
+            cells[1::2] = record.translate(Corpus.HIGH_NIBBLES)[:num_cells // 2]
+            return cells
+        packed = int.from_bytes(record, 'little')
+        mask = (1 << bits_per_cell) - 1
+        for index in range(num_cells):
+            cells[index] = packed & mask
+            packed >>= bits_per_cell
+        return cells
+
+
+class CorpusWriter:
+    """
+    Writes boards to a corpus file. The puzzle count in the header is kept up to date when the writer is closed,
+    so the writer should be used as a context manager:
+        with CorpusWriter(path) as writer:
+            writer.extend(boards)
+    """
+
+    def __init__(self, path, size=(9, 9), box_size=None):
+        self.geometry = get_geometry(size, box_size)
+        self.bits_per_cell = Corpus.get_bits_per_cell(self.geometry)
+        self.record_size = Corpus.get_record_size(self.geometry)
+        self.count = 0
+        self.file = open(path, 'wb')
+        self.file.write(struct.pack(Corpus.HEADER_FORMAT, Corpus.MAGIC, Corpus.VERSION, *self.geometry.get_shape(),
+                                    self.bits_per_cell, 0, self.record_size))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def append_cells(self, cells):
+        """Appends one board given as a flat sequence of numbers, row by row"""
+        if len(cells) != self.geometry.num_cells:
+            raise ValueError(f'Expected {self.geometry.num_cells} cells, got {len(cells)}')
+        self.file.write(Corpus.pack(cells, self.bits_per_cell, self.record_size))
+        self.count += 1
+
+    def append(self, board):
+        """Appends the current layout of the given board"""
+        if board.geometry is not self.geometry:
+            raise ValueError(f'Cannot write a board with {board.geometry} to a corpus of {self.geometry}')
+        self.append_cells(board.cells)
+
+    def extend(self, boards):
+        """Appends every board in the given iterable"""
+        for board in boards:
+            self.append(board)
+
+    def append_line(self, line):
+        """Appends a board written as a single line of text, e.g. '..3.2.6..9..3.5..1...', where '.' or '0' is an empty cell"""
+        self.append_cells([0 if char in Corpus.EMPTY_CHARS else int(char, 36) for char in line.strip()])
+
+    def close(self):
+        """Writes the final puzzle count into the header and closes the file"""
+        if not self.file.closed:
+            self.file.seek(Corpus.COUNT_OFFSET)
+            self.file.write(struct.pack('<Q', self.count))
+            self.file.close()
+
+
+class CorpusReader:
+    """
+    Gives random access to the boards of a corpus file without loading it into memory. The file is memory-mapped,
+    and each record is only unpacked when it is requested:
+        with CorpusReader(path) as corpus:
+            board = corpus[12345]
+            batch = corpus[1000:2000]
+    """
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, height, width, box_height, box_width, self.bits_per_cell, self.count, self.record_size = \
+            struct.unpack_from(Corpus.HEADER_FORMAT, self.map)
+        if magic != Corpus.MAGIC:
+            raise ValueError(f'{path} is not a puzzle corpus')
+        if version != Corpus.VERSION:
+            raise ValueError(f'{path} uses corpus version {version}, but only version {Corpus.VERSION} is supported')
+        self.geometry = get_geometry((height, width), (box_height, box_width))
+        if len(self.map) < Corpus.HEADER_SIZE + self.count * self.record_size:
+            raise ValueError(f'{path} is truncated')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        """Returns the Board at the given index, or a list of Boards if given a slice"""
+        if isinstance(index, slice):
+            return [self.get_board(i) for i in range(*index.indices(self.count))]
+        return self.get_board(index)
+
+    def __iter__(self):
+        for index in range(self.count):
+            yield self.get_board(index)
+
+    def get_record(self, index):
+        """
+        Returns a zero-copy memoryview of the packed record at the given index.
+        The view must be released before the reader is closed
+        """
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError('corpus index out of range')
+        start = Corpus.HEADER_SIZE + index * self.record_size
+        return memoryview(self.map)[start:start + self.record_size]
+
+    def get_cells(self, index):
+        """Returns the numbers of the board at the given index as a flat bytearray"""
+        with self.get_record(index) as record:
+            return Corpus.unpack(record, self.bits_per_cell, self.geometry.num_cells)
+
+    def get_board(self, index):
+        """Returns the board at the given index, with all of its numbers set as initial clues"""
+        return Board.from_cells(self.get_cells(index), self.geometry)
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+
+def convert_text_file(text_path, corpus_path, size=(9, 9), box_size=None):
+    """
+    Converts a text file with one board per line (see CorpusWriter.append_line) into a corpus file.
+    Blank lines and lines starting with '#' are skipped
+    :return: The number of boards written
+    """
+    with open(text_path) as text_file, CorpusWriter(corpus_path, size, box_size) as writer:
+        for line in text_file:
+            if line.strip() and not line.startswith('#'):
+                writer.append_line(line)
+        return writer.count
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser('Convert text puzzle files to the binary corpus format, or inspect a corpus')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    convert_parser = subparsers.add_parser('convert')
+    convert_parser.add_argument('text_path')
+    convert_parser.add_argument('corpus_path')
+    convert_parser.add_argument('--size', type=int, dest='size', default=9)
+    info_parser = subparsers.add_parser('info')
+    info_parser.add_argument('corpus_path')
+    args = parser.parse_args()
+
+    if args.command == 'convert':
+        count = convert_text_file(args.text_path, args.corpus_path, (args.size, args.size))
+        print(f'Wrote {count} boards to {args.corpus_path}')
+    elif args.command == 'info':
+        with CorpusReader(args.corpus_path) as corpus:
+            print(f'{len(corpus)} boards of {corpus.geometry}, {corpus.bits_per_cell} bits per cell, '
+                  f'{corpus.record_size} bytes per board')
@@ -1,7 +1,10 @@
 from copy import deepcopy
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event
 
 import pygame as pg
-from Solvers import *
+from Solvers import Solver, solver_cache
+from Hints import HintEngine
 
 
 class GUI:
@@ -11,6 +14,9 @@ class GUI:
     CELL_CLICKED_COLOR = (208, 208, 208)
     CHECK_BOARD_COLOR = (153, 204, 255)
     SOLVER_COLOR = (255, 153, 51)
+    CONFLICT_COLOR = (204, 0, 0)
+    HINT_COLOR = (204, 255, 204)
+    HINT_CELL_COLOR = (102, 204, 102)
     SQUARE_SIZE = 50
     DIVIDER_SIZE = 5
     FPS = 30
@@ -35,12 +41,19 @@ class GUI:
         self.mrv_button = None
         self.lcv_button = None
         self.fc_button = None
-        self.board_solution = self.get_solution()
+        self.hint_button = None
+        self.hints = None  # The HintEngine, created on the first click of the 'Hint' button
+        self.hint = None  # The hint currently shown, if any
+        self.solution_executor = ThreadPoolExecutor(max_workers=1)
+        self.solution_future = None
+        self.solution_board = None  # The board being solved in the background
+        self.solution_stop = Event()  # Set on exit to stop the background solve, see start_solution_precompute()
 
     def run_game(self):
         """Manages the logic of the game"""
         pg.event.clear()
         self.draw_all(init=True)
+        self.start_solution_precompute()
         expecting_input = False
 
         while self.playing:
@@ -84,6 +97,9 @@ class GUI:
                     self.animate_fc_solution()
                     self.won = True
 
+                elif self.hint_button.collidepoint(pos):  # The user clicked on the 'Hint' button
+                    self.show_hint()
+
                 else:  # If the user clicked on something other than a cell
                     self.highlighted_cell = None
                     expecting_input = False
@@ -93,11 +109,14 @@ class GUI:
                     col, row, *_ = self.highlighted_cell
                     row, col = self.convert_row_col_from_pixel(row, col)
                     self.board.apply_move(row, col, self.convert_pg_number(event.key))
+                    self.hint = None
                 elif event.key in GUI.ARROW_KEYS:  # If the user hit an arrow key
                     self.move_highlighted_cell(event.key)
 
             self.draw_all()
 
+        self.solution_stop.set()  # Otherwise the interpreter would wait for a hard background solve to finish before exiting
+        self.solution_executor.shutdown(wait=False, cancel_futures=True)
         pg.quit()
 
     def move_highlighted_cell(self, event_key):  # TODO
@@ -119,15 +138,11 @@ class GUI:
         self.highlighted_cell = (col, row, _x, _y)
 
     def check_board(self):
-        """Checks the current board against the solution. Will return True iff the current board is both full and correct"""
-        for row in range(self.height):
-            for col in range(self.width):
-                if self.board.board[row][col] != self.board_solution.board[row][col]:
-                    return False
-        return True
+        """Checks the current board using the board's live conflict tracking. Will return True iff the current board is both full and correct"""
+        return self.board.valid_complete_board()
 
     def general_animation(self, solver):
-        solver.solve_board()
+        """Animates the steps of an already solved Solver object"""
         steps = solver.get_steps()
 
         for row, col, num in steps:
@@ -141,28 +156,51 @@ class GUI:
 
     def animate_fc_solution(self):
         """Will solve the board using Forward Checking and then animate the steps required to find the solution"""
-        solver = ForwardCheckingSolver(deepcopy(self.board))
-        self.general_animation(solver)
+        self.general_animation(solver_cache.solve(Solver.FORWARD_CHECKING_SOLVER, self.board))
 
     def animate_backtracking_solution(self):
         """Will solve the board using backtracking and then animate the steps required to find the solution"""
-        solver = BacktrackingSolver(deepcopy(self.board))
-        self.general_animation(solver)
+        if self.solution_future is not None and self.board.cells == self.solution_board.cells:
+            self.get_solution()  # The board was not edited, so the background solve's steps can be reused once it finishes
+        self.general_animation(solver_cache.solve(Solver.BACKTRACKING_SOLVER, self.board))
 
     def animate_mrv_solution(self):
         """Will solve the board using mrv and then animate the steps required to find the solution"""
-        solver = MinimumRemainingValuesSolver(deepcopy(self.board))
-        self.general_animation(solver)
+        self.general_animation(solver_cache.solve(Solver.MRV_SOLVER, self.board))
 
     def animate_lcv_solution(self):
         """Will solve the board using lcv and then animate the steps required to find the solution"""
-        solver = LeastConstrainingValueSolver(deepcopy(self.board))
-        self.general_animation(solver)
+        self.general_animation(solver_cache.solve(Solver.LCV_SOLVER, self.board))
+
+    def show_hint(self):
+        """
+        Shows the easiest logical deduction available on the board. Candidates ruled out by the hint are crossed out
+        right away, so that the next hint builds on them
+        """
+        if self.hints is None:
+            self.hints = HintEngine(self.board)
+        self.hint = self.hints.next_hint()
+        if self.hint is not None and self.hint.cell is None:
+            self.hints.apply_hint(self.hint)
+
+    def start_solution_precompute(self):
+        """
+        Starts solving the initial board in a background thread. Should be called once the first frame has been drawn,
+        so that a hard board does not keep the window from appearing. The solved Solver is shared through solver_cache.
+        The solve is stopped through self.solution_stop when the window is closed
+        """
+        if self.solution_future is None:
+            self.solution_board = deepcopy(self.board)
+            self.solution_future = self.solution_executor.submit(solver_cache.solve, Solver.BACKTRACKING_SOLVER,
+                                                                 self.solution_board, self.solution_stop)
 
     def get_solution(self):
-        """Calculates and returns the solution to the board"""
-        solver = BacktrackingSolver(deepcopy(self.board))
-        return solver.solve_board()
+        """Returns the solution to the board, waiting for the background solve to finish while keeping the window responsive"""
+        self.start_solution_precompute()
+        while not self.solution_future.done():
+            pg.event.pump()  # Needs to be here; otherwise, the OS will think the program stopped responding
+            self.clock.tick(GUI.FPS)
+        return self.solution_future.result().board
 
     def convert_row_col_to_pixel(self, row, col):
         """Converts the (row, col) pair from Sudoku board units to pixel units"""
@@ -258,6 +296,27 @@ class GUI:
         self.mrv_button = self.draw_button(2, 'MRV')
         self.lcv_button = self.draw_button(3, 'LCV')
         self.fc_button = self.draw_button(4, 'FC')
+        self.hint_button = self.draw_button(5, 'Hint', GUI.HINT_COLOR)
+
+    def draw_hint(self):
+        """Shades the cells the current hint is based on, and writes the hint under the buttons"""
+        if self.hint is None:
+            return
+        for row, col in self.hint.cells:
+            pixel_row, pixel_col = self.convert_row_col_to_pixel(row, col)
+            pg.draw.rect(self.window, GUI.HINT_COLOR, (pixel_col, pixel_row, GUI.SQUARE_SIZE, GUI.SQUARE_SIZE))
+        if self.hint.cell is not None:
+            pixel_row, pixel_col = self.convert_row_col_to_pixel(*self.hint.cell)
+            pg.draw.rect(self.window, GUI.HINT_CELL_COLOR, (pixel_col, pixel_row, GUI.SQUARE_SIZE, GUI.SQUARE_SIZE))
+
+        font = pg.font.SysFont('times new roman', 14)
+        lines = [self.hint.technique]
+        if self.hint.cell is not None:
+            lines.append(f'{self.hint.num} at ({self.hint.cell[0] + 1}, {self.hint.cell[1] + 1})')
+        elif self.hint.eliminations:
+            lines.append(f'{len(self.hint.eliminations)} candidates ruled out')
+        for line_number, line in enumerate(lines):
+            self.window.blit(font.render(line, 1, (0, 0, 0)), (468, 220 + line_number * 18))
 
     def draw_numbers(self):
         """Draws the numbers onto the board"""
@@ -270,9 +329,10 @@ class GUI:
             for col in range(self.width):
                 num_col_dividers = col // self.board.mini_box_width
                 if self.board.board[row][col] != 0:  # If there is a number in the desired cell
-                    num_text = font_user_board.render(str(self.board.board[row][col]), 1, (0, 0, 0))
+                    color = GUI.CONFLICT_COLOR if self.board.is_conflicting(row, col) else (0, 0, 0)
+                    num_text = font_user_board.render(str(self.board.board[row][col]), 1, color)
                     if self.board.initial_board[row][col] != 0:  # If that number is part of the original board
-                        num_text = font_init_board.render(str(self.board.board[row][col]), 1, (0, 0, 0))
+                        num_text = font_init_board.render(str(self.board.board[row][col]), 1, color)
                     self.window.blit(num_text, (GUI.SQUARE_SIZE * col + num_col_dividers * GUI.DIVIDER_SIZE + text_x_padding,
                                                 GUI.SQUARE_SIZE * row + num_row_dividers * GUI.DIVIDER_SIZE + text_y_padding))
 
@@ -328,6 +388,7 @@ class GUI:
     def draw_all(self, init=False):
         """Draws the graphics onto the window. If drawing for the first time, set init to 'True'"""
         self.draw_grid(init)
+        self.draw_hint()
         self.draw_highlighted_cell()
         self.draw_vertical_lines()
         self.draw_horizontal_lines()
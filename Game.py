@@ -1,18 +1,26 @@
-from Solvers import *
-from GUI import *
+from Board import Board
+from Solvers import Solver, CHECKPOINT_SOLVERS, get_solver, resume_solver
 import argparse
+import os
 
 
 class Game:
 
     QUIT = 'q'
-    INPUT_PROMPT = 'Please provide a "row col num" input or type "q" to quit:\n'
+    HINT = 'h'
+    INPUT_PROMPT = 'Please provide a "row col num" input, type "h" for a hint or "q" to quit:\n'
     INVALID_ROW_MSG = 'Invalid row choice. Please try again'
     INVALID_COL_MSG = 'Invalid column choice. Please try again'
     INVALID_NUM_MSG = 'Invalid number choice. Please try again'
 
-    def __init__(self, size=(9, 9)):
+    def __init__(self, size=(9, 9), store=None):
+        """
+        :param size: The (height, width) of the board
+        :param store: An optional SolutionStore, checked before running a solver
+        """
         self.board = Board(size)
+        self.store = store
+        self.hints = None  # The HintEngine, created on the first request for a hint
         self.playing = True
 
     def __is_valid_input(self, row, col, num):
@@ -41,6 +49,8 @@ class Game:
                 print('Ending game...')
                 self.playing = False
                 return Game.QUIT, None, None
+            elif len(split_input) == 1 and split_input[0].lower() == Game.HINT:
+                return Game.HINT, None, None
             elif len(split_input) == 3:
                 row_input, col_input, num_input = split_input
                 row_input, col_input, num_input = int(row_input), int(col_input), int(num_input)
@@ -52,25 +62,63 @@ class Game:
         row, col, num = self.get_input()
         if row == Game.QUIT:
             return
+        if row == Game.HINT:
+            self.give_hint()
+            return
         self.board.apply_move(row, col, num)
         print(self.board)
 
+    def give_hint(self):
+        """
+        Prints the easiest logical deduction available on the board. The player fills in cells themselves, but
+        candidates ruled out by a hint are crossed out right away so that the next hint builds on them
+        """
+        from Hints import HintEngine  # Imported here so that the hint engine is only loaded once a hint is asked for
+        if self.hints is None:
+            self.hints = HintEngine(self.board)
+        hint = self.hints.next_hint()
+        print(HintEngine.describe(hint))
+        if hint is not None and hint.cell is None:
+            self.hints.apply_hint(hint)
+
     def run_game_from_cli(self):
         """Runs an entire game to be played from the command line"""
         print(self.board)
         while self.playing:
             self.one_turn()
 
-    def run_solver_game(self, solver_name):
+    def run_solver_game(self, solver_name, checkpoint_path=None):
+        """
+        Solves the board with the given solver and prints the solution
+        :param checkpoint_path: If given, the search state is saved to this file as the solver runs, and a search
+                                which was cut short is resumed from it. Cannot be combined with a SolutionStore
+        """
+        if checkpoint_path is not None and self.store is not None:
+            raise ValueError('Checkpoints cannot be used together with a solution store')
         print(f'Solving the board using {solver_name}. The original board is \n{self.board}')
-        solver_obj = get_solver(solver_name, self.board)
-        solved_board = solver_obj.solve_board()
+        if self.store is not None:
+            solver_obj = self.store.solve(solver_name, self.board)
+            solved_board = solver_obj.board
+        elif checkpoint_path is not None:
+            if os.path.exists(checkpoint_path):
+                print(f'Resuming the search from {checkpoint_path}')
+                solver_obj = resume_solver(checkpoint_path)
+            else:
+                solver_obj = get_solver(solver_name, self.board)
+            solver_obj.enable_checkpoints(checkpoint_path)
+            solved_board = solver_obj.solve_board()
+            if os.path.exists(checkpoint_path):  # The search finished, so there is nothing left to resume
+                os.remove(checkpoint_path)
+        else:
+            solver_obj = get_solver(solver_name, self.board)
+            solved_board = solver_obj.solve_board()
         if solver_obj.was_solved():
             print(f'The board was successfully solved in {solver_obj.get_time_used_to_solve()} seconds.\nHere is the solution:\n{solved_board}')
         else:
             print(f'The solver could not find a solution to the board :(')
 
     def run_gui_game(self):
+        from GUI import GUI  # Imported here so that pygame is only loaded when the GUI is used
         gui = GUI(self.board)
         gui.run_game()
 
@@ -80,13 +128,23 @@ if __name__ == '__main__':
     displays = ['gui', 'cli']
     parser.add_argument('-d', '--display', choices=displays, dest='display', type=str, default='gui')
     parser.add_argument('-s', '--solver', choices=Solver.SOLVERS, dest='solver', type=str, default=None)
+    parser.add_argument('--store', dest='store', type=str, default=None, help='Path of a solution store to reuse solutions from')
+    parser.add_argument('--checkpoint', dest='checkpoint', type=str, default=None, help='Path of a file to save the search state to, or resume it from')
     args = parser.parse_args()
+    if args.checkpoint and args.store:
+        parser.error('--checkpoint cannot be used together with --store')
+    if args.checkpoint and args.solver not in CHECKPOINT_SOLVERS:
+        parser.error(f'--checkpoint requires one of the solvers {list(CHECKPOINT_SOLVERS)}')
 
-    game = Game()
+    store = None
+    if args.store:
+        from SolutionStore import SolutionStore  # Imported here so that sqlite3 is only loaded when a store is used
+        store = SolutionStore(args.store)
+    game = Game(store=store)
     if args.display == 'cli':
         if args.solver:
             if args.solver in Solver.SOLVERS:
-                game.run_solver_game(args.solver)
+                game.run_solver_game(args.solver, args.checkpoint)
             else:
                 print(f'Invalid solver name.\nThe valid solver names are: {Solver.SOLVERS}')
         else:
@@ -0,0 +1,170 @@
+from collections import namedtuple
+from functools import lru_cache
+from itertools import combinations
+from math import isqrt
+
+
+# Declares the extra constraints of a Sudoku variant:
+#   diagonal: Both main diagonals hold every number once
+#   windoku: The extra windows, mini box sized and spaced one cell apart from the edges and each other, hold every number once
+#   cages: A tuple of killer cages, each a (total, ((row, col), ...)) pair. The numbers in a cage never repeat and sum to the total
+Variants = namedtuple('Variants', ['diagonal', 'windoku', 'cages'], defaults=(False, False, ()))
+
+
+@lru_cache(maxsize=None)
+def get_cage_combinations(max_num, size, total):
+    """Returns the bitmasks of every set of size distinct numbers from 1 to max_num which sum to total"""
+    return tuple(sum(1 << num for num in nums) for nums in combinations(range(1, max_num + 1), size) if sum(nums) == total)
+
+
+class Geometry:
+    """
+    Holds the precomputed layout tables for one board shape: the cells of every row, column and mini box,
+    which units each cell belongs to, and each cell's peers (every other cell sharing a unit with it).
+    The tables are built once per shape and shared by every Board and Solver using that shape,
+    so get_geometry() should be used instead of instantiating this class directly.
+    Cells are addressed either by (row, col) or by their flat index, row * width + col.
+
+    Variants compile their extra constraints into the same tables: diagonals, windows and killer cages are simply
+    more units after the rows, columns and boxes, so every unit and peer based check handles them for free. A cage
+    may hold fewer cells than there are numbers, and its sum is checked through cage_subsets, the precomputed set of
+    every number bitmask that can still be completed to a valid combination for the cage
+    """
+
+    def __init__(self, height, width, box_height, box_width, variants=None):
+        if height != width or box_height * box_width != height:
+            raise ValueError(f'A {height}x{width} board cannot be split into {box_height}x{box_width} mini boxes')
+        self.height, self.width = height, width
+        self.box_height, self.box_width = box_height, box_width
+        self.variants = variants
+        self.num_cells = height * width
+        self.valid_nums = tuple(range(1, box_height * box_width + 1))
+        self.cell_coords = tuple((row, col) for row in range(height) for col in range(width))
+
+        boxes_per_row = width // box_width
+        self.rows = tuple(tuple(row * width + col for col in range(width)) for row in range(height))
+        self.cols = tuple(tuple(row * width + col for row in range(height)) for col in range(width))
+        self.boxes = tuple(
+            tuple((box_row * box_height + _row) * width + box_col * box_width + _col
+                  for _row in range(box_height) for _col in range(box_width))
+            for box_row in range(height // box_height) for box_col in range(boxes_per_row)
+        )
+        self.units = self.rows + self.cols + self.boxes
+        self.cages = ()  # The indices into self.units of the killer cages
+        if variants is not None:
+            self.__add_variant_units(variants)
+        # The units which hold every number exactly once. Cages with fewer cells than numbers are the only exception
+        self.full_units = tuple(unit_index for unit_index, unit in enumerate(self.units) if len(unit) == len(self.valid_nums))
+
+        # cell_units[index] holds the indices into self.units of every unit containing the cell
+        cell_units = [[] for _ in range(self.num_cells)]
+        for unit_index, unit in enumerate(self.units):
+            for index in unit:
+                cell_units[index].append(unit_index)
+        self.cell_units = tuple(tuple(units) for units in cell_units)
+
+        self.peers = tuple(
+            tuple(sorted({other for unit_index in self.cell_units[index] for other in self.units[unit_index]} - {index}))
+            for index in range(self.num_cells)
+        )
+        self.peer_coords = tuple(tuple(self.cell_coords[peer] for peer in peers) for peers in self.peers)
+
+        # Boards keep their digit counts in one flat array with count_stride entries per unit (one per digit, plus 0).
+        # count_offsets[index] holds the offset of every unit containing the cell
+        self.count_stride = len(self.valid_nums) + 1
+        self.count_offsets = tuple(tuple(unit * self.count_stride for unit in units) for units in self.cell_units)
+        self.full_mask = sum(1 << num for num in self.valid_nums)  # Bit num is set for every valid number
+
+        # cell_cages[index] holds the indices into self.units of the cages containing the cell.
+        # cage_combinations[unit] holds the number bitmasks a full cage may have, and cage_subsets[unit] every part of them
+        self.cell_cages = tuple(tuple(unit for unit in units if unit in self.cages) for units in self.cell_units)
+        self.cage_combinations = dict()
+        self.cage_subsets = dict()
+        for (total, _), unit_index in zip(variants.cages if variants else (), self.cages):
+            combos = get_cage_combinations(len(self.valid_nums), len(self.units[unit_index]), total)
+            if not combos:
+                raise ValueError(f'No {len(self.units[unit_index])} distinct numbers sum to {total}')
+            self.cage_combinations[unit_index] = frozenset(combos)
+            subsets = set()
+            for combo in combos:
+                bits = [1 << num for num in self.valid_nums if combo >> num & 1]
+                for count in range(len(bits) + 1):
+                    subsets.update(sum(chosen) for chosen in combinations(bits, count))
+            self.cage_subsets[unit_index] = frozenset(subsets)
+
+    def __add_variant_units(self, variants):
+        """Appends the units of the variant's extra constraints to self.units"""
+        extra_units = []
+        if variants.diagonal:
+            extra_units.append(tuple(index * self.width + index for index in range(self.height)))
+            extra_units.append(tuple(index * self.width + self.width - 1 - index for index in range(self.height)))
+        if variants.windoku:
+            window_rows = range(1, self.height - self.box_height, self.box_height + 1)
+            window_cols = range(1, self.width - self.box_width, self.box_width + 1)
+            extra_units.extend(
+                tuple((top + row) * self.width + left + col for row in range(self.box_height) for col in range(self.box_width))
+                for top in window_rows for left in window_cols
+            )
+        first_cage = len(self.units) + len(extra_units)
+        for total, cells in variants.cages:
+            cage = tuple(self.cell_index(row, col) for row, col in cells)
+            if len(set(cage)) != len(cage) or not all(0 <= row < self.height and 0 <= col < self.width for row, col in cells):
+                raise ValueError(f'The cage {cells} has repeated cells or cells outside of the board')
+            extra_units.append(cage)
+        self.cages = tuple(range(first_cage, first_cage + len(variants.cages)))
+        self.units += tuple(extra_units)
+
+    def __repr__(self):
+        variants = f', {self.variants}' if self.variants else ''
+        return f'Geometry({self.height}x{self.width}, boxes {self.box_height}x{self.box_width}{variants})'
+
+    def __reduce__(self):
+        # Unpickling goes through get_geometry() so that the tables stay shared in the receiving process
+        return get_geometry, ((self.height, self.width), (self.box_height, self.box_width), self.variants)
+
+    def get_shape(self):
+        """Returns the (height, width, box_height, box_width) tuple describing this geometry"""
+        return self.height, self.width, self.box_height, self.box_width
+
+    def cell_index(self, row, col):
+        """Converts a (row, col) pair to the cell's flat index"""
+        return row * self.width + col
+
+    def box_index(self, row, col):
+        """Returns the index of the mini box the cell resides in. Boxes are numbered left to right, top to bottom"""
+        return (row // self.box_height) * (self.width // self.box_width) + col // self.box_width
+
+
+def get_default_box_size(size):
+    """
+    Returns the (box_height, box_width) pair used for a board of the given side length. The boxes are as close
+    to square as possible and never taller than they are wide, e.g. 9 -> 3x3, 6 -> 2x3, 12 -> 3x4
+    """
+    box_height = isqrt(size)
+    while size % box_height != 0:
+        box_height -= 1
+    return box_height, size // box_height
+
+
+geometries = dict()  # Maps each (height, width, box_height, box_width, variants) key to its shared Geometry
+
+
+def get_geometry(size=(9, 9), box_size=None, variants=None):
+    """
+    Returns the shared Geometry for the requested shape, building it on first use
+    :param size: The (height, width) of the board
+    :param box_size: The (box_height, box_width) of the mini boxes. Defaults to get_default_box_size(height)
+    :param variants: An optional Variants object declaring extra constraints. Its cages may be given as any sequences
+    """
+    height, width = size
+    box_height, box_width = box_size if box_size else get_default_box_size(height)
+    if variants is not None:
+        # Normalize the declaration so that equal variants share one Geometry, and plain Sudoku is always None
+        variants = Variants(bool(variants.diagonal), bool(variants.windoku),
+                            tuple((total, tuple(tuple(cell) for cell in cells)) for total, cells in variants.cages))
+        if variants == Variants():
+            variants = None
+    key = (height, width, box_height, box_width, variants)
+    if key not in geometries:
+        geometries[key] = Geometry(*key)
+    return geometries[key]
@@ -0,0 +1,235 @@
+from collections import namedtuple
+
+
+# A logical deduction about a board.
+# cell and num are the (row, col) cell to fill and the number to fill it with, or None if the hint only rules out
+# candidates. eliminations is a tuple of the (row, col, num) candidates which can be crossed out, and cells holds the
+# (row, col) cells the deduction is based on
+Hint = namedtuple('Hint', ['technique', 'cell', 'num', 'eliminations', 'cells'])
+
+
+def get_mask_nums(mask):
+    """Returns the list of numbers whose bits are set in the given bitmask"""
+    nums = []
+    while mask:
+        low_bit = mask & -mask
+        nums.append(low_bit.bit_length() - 1)
+        mask ^= low_bit
+    return nums
+
+
+def count_bits(mask):
+    return bin(mask).count('1')
+
+
+class HintEngine:
+    """
+    Finds the easiest logical deduction available on a board, for players who want a nudge rather than a full solve.
+    The engine keeps a candidate bitmask for every cell (bit num is set iff num can still go in the cell), which it
+    registers as the board's listener to keep up to date: filling an empty cell only clears that number from the
+    cell's peers, so hints stay instant no matter how many moves were made. Candidates crossed out by applying a hint
+    are remembered as well, until a number is erased or overwritten and the candidates are rebuilt from the board.
+    Only one engine can listen to a board at a time
+    """
+
+    MISTAKE = 'mistake'
+    NAKED_SINGLE = 'naked single'
+    HIDDEN_SINGLE = 'hidden single'
+    LOCKED_CANDIDATES = 'locked candidates'
+    NAKED_PAIR = 'naked pair'
+    HIDDEN_PAIR = 'hidden pair'
+
+    TECHNIQUES = [NAKED_SINGLE, HIDDEN_SINGLE, LOCKED_CANDIDATES, NAKED_PAIR, HIDDEN_PAIR]  # From easiest to hardest
+
+    def __init__(self, board):
+        self.board = board
+        self.geometry = board.geometry
+        self.candidates = [0] * self.geometry.num_cells
+        self.eliminated = [0] * self.geometry.num_cells  # Candidates crossed out by applied hints
+        self.hint = None  # The last hint found, kept until the board or the candidates change
+        board.listener = self.on_board_change
+        self.refresh()
+
+    def detach(self):
+        """Stops listening to the board"""
+        if self.board.listener == self.on_board_change:
+            self.board.listener = None
+
+    def refresh(self):
+        """Rebuilds every cell's candidates from the board, forgetting the crossed out candidates"""
+        self.eliminated = [0] * self.geometry.num_cells
+        cells = self.board.cells
+        for index in range(self.geometry.num_cells):
+            self.candidates[index] = self.board.get_candidate_mask(index) if cells[index] == 0 else 0
+        self.hint = None
+
+    def on_board_change(self, index, old_num):
+        """Updates the candidates after a change to the board. See Board.listener"""
+        self.hint = None
+        if index is None or old_num != 0:  # Erasing a number can bring candidates back, so start over
+            self.refresh()
+            return
+        num = self.board.cells[index]
+        if num == 0:
+            return
+        self.candidates[index] = 0
+        mask = ~(1 << num)
+        for peer in self.geometry.peers[index]:
+            self.candidates[peer] &= mask
+        for cage in self.geometry.cell_cages[index]:  # The cage's sum may rule out more numbers in the rest of the cage
+            for other in self.geometry.units[cage]:
+                if self.candidates[other]:
+                    self.candidates[other] &= self.board.get_candidate_mask(other) & ~self.eliminated[other]
+
+    def get_candidates(self, row, col):
+        """Returns the list of numbers which can still go in the given cell"""
+        return get_mask_nums(self.candidates[self.geometry.cell_index(row, col)])
+
+    def get_technique_finders(self):
+        """Returns the methods finding each technique's deductions, in the same order as HintEngine.TECHNIQUES"""
+        return [self.find_naked_single, self.find_hidden_single, self.find_locked_candidates,
+                self.find_naked_pair, self.find_hidden_pair]
+
+    def next_hint(self):
+        """Returns the Hint using the easiest technique that applies to the board, or None if none of them do"""
+        if self.hint is None:
+            for find in [self.find_mistake] + self.get_technique_finders():
+                self.hint = find()
+                if self.hint is not None:
+                    break
+        return self.hint
+
+    def apply_hint(self, hint):
+        """Fills in the hint's cell, if it has one, and crosses out its eliminated candidates"""
+        if hint.cell is not None:
+            self.board.apply_move(*hint.cell, hint.num)
+        for row, col, num in hint.eliminations:
+            index = self.geometry.cell_index(row, col)
+            self.eliminated[index] |= 1 << num
+            self.candidates[index] &= ~(1 << num)
+        self.hint = None
+
+    @staticmethod
+    def describe(hint):
+        """Returns a sentence explaining the hint to the player, with rows and columns counted from 1"""
+        if hint is None:
+            return 'No hint is available for this board'
+        if hint.technique == HintEngine.MISTAKE:
+            return 'There is a mistake around ' + ', '.join(f'({row + 1}, {col + 1})' for row, col in hint.cells)
+        if hint.cell is not None:
+            row, col = hint.cell
+            return f'{hint.technique.capitalize()}: {hint.num} goes in row {row + 1}, column {col + 1}'
+        eliminations = ', '.join(f'{num} from ({row + 1}, {col + 1})' for row, col, num in hint.eliminations)
+        return f'{hint.technique.capitalize()}: remove {eliminations}'
+
+    def find_mistake(self):
+        """Finds a repeated number, an empty cell with no candidates, or a unit with nowhere left for a number"""
+        if self.board.conflicts:
+            return Hint(HintEngine.MISTAKE, None, None, (), tuple(self.board.get_conflicting_cells()))
+        cells, coords = self.board.cells, self.geometry.cell_coords
+        for index, mask in enumerate(self.candidates):
+            if mask == 0 and cells[index] == 0:
+                return Hint(HintEngine.MISTAKE, None, None, (), (coords[index],))
+        for unit_index in self.geometry.full_units:
+            unit = self.geometry.units[unit_index]
+            union = self.board.unit_masks[unit_index]
+            for index in unit:
+                union |= self.candidates[index]
+            if union != self.geometry.full_mask:
+                return Hint(HintEngine.MISTAKE, None, None, (), tuple(coords[index] for index in unit))
+        return None
+
+    def find_naked_single(self):
+        """Finds a cell with only one candidate left"""
+        for index, mask in enumerate(self.candidates):
+            if mask and mask & (mask - 1) == 0:
+                cell = self.geometry.cell_coords[index]
+                return Hint(HintEngine.NAKED_SINGLE, cell, mask.bit_length() - 1, (), (cell,))
+        return None
+
+    def find_hidden_single(self):
+        """Finds a number which only has one possible cell left in some row, column, mini box or other full unit"""
+        candidates, coords = self.candidates, self.geometry.cell_coords
+        for unit_index in self.geometry.full_units:
+            unit = self.geometry.units[unit_index]
+            once = twice = 0
+            for index in unit:
+                twice |= once & candidates[index]
+                once |= candidates[index]
+            singles = once & ~twice
+            if singles:
+                num = (singles & -singles).bit_length() - 1
+                index = next(index for index in unit if candidates[index] >> num & 1)
+                return Hint(HintEngine.HIDDEN_SINGLE, coords[index], num, (), tuple(coords[other] for other in unit))
+        return None
+
+    def find_locked_candidates(self):
+        """
+        Finds a number whose candidates in one unit all lie in a second unit as well, e.g. all in one row of a
+        mini box. The number must go in the overlap, so it can be crossed out from the rest of the second unit.
+        The first unit must hold every number, but the second can be any unit, including a cage
+        """
+        candidates, coords = self.candidates, self.geometry.cell_coords
+        units, cell_units = self.geometry.units, self.geometry.cell_units
+        for unit_index in self.geometry.full_units:
+            unit = units[unit_index]
+            union = 0
+            for index in unit:
+                union |= candidates[index]
+            for num in get_mask_nums(union):
+                bit = 1 << num
+                holders = [index for index in unit if candidates[index] & bit]
+                if len(holders) < 2:
+                    continue
+                shared = set(cell_units[holders[0]]).intersection(*(cell_units[index] for index in holders[1:]))
+                shared.discard(unit_index)
+                for other in sorted(shared):
+                    eliminations = tuple((*coords[index], num) for index in units[other]
+                                         if candidates[index] & bit and index not in holders)
+                    if eliminations:
+                        return Hint(HintEngine.LOCKED_CANDIDATES, None, num, eliminations,
+                                    tuple(coords[index] for index in holders))
+        return None
+
+    def find_naked_pair(self):
+        """Finds two cells of a unit with the same two candidates, which can then be crossed out from the rest of the unit"""
+        candidates, coords = self.candidates, self.geometry.cell_coords
+        for unit in self.geometry.units:
+            pairs = dict()  # Maps each two-candidate mask to the first cell of the unit having it
+            for index in unit:
+                mask = candidates[index]
+                if count_bits(mask) != 2:
+                    continue
+                if mask not in pairs:
+                    pairs[mask] = index
+                    continue
+                pair = (pairs[mask], index)
+                eliminations = tuple((*coords[other], num) for other in unit if other not in pair
+                                     for num in get_mask_nums(candidates[other] & mask))
+                if eliminations:
+                    return Hint(HintEngine.NAKED_PAIR, None, None, eliminations, tuple(coords[cell] for cell in pair))
+        return None
+
+    def find_hidden_pair(self):
+        """Finds two numbers which can only go in the same two cells of a unit, so no other number can go in those cells"""
+        candidates, coords = self.candidates, self.geometry.cell_coords
+        for unit_index in self.geometry.full_units:
+            unit = self.geometry.units[unit_index]
+            positions = dict()  # Maps each number to a bitmask of the positions in the unit where it can go
+            for position, index in enumerate(unit):
+                for num in get_mask_nums(candidates[index]):
+                    positions[num] = positions.get(num, 0) | 1 << position
+            pairs = dict()  # Maps each two-position mask to the first number having it
+            for num, mask in positions.items():
+                if count_bits(mask) != 2:
+                    continue
+                if mask not in pairs:
+                    pairs[mask] = num
+                    continue
+                pair_mask = 1 << num | 1 << pairs[mask]
+                cells = [unit[position] for position in get_mask_nums(mask)]
+                eliminations = tuple((*coords[index], other) for index in cells
+                                     for other in get_mask_nums(candidates[index] & ~pair_mask))
+                if eliminations:
+                    return Hint(HintEngine.HIDDEN_PAIR, None, None, eliminations, tuple(coords[index] for index in cells))
+        return None
@@ -0,0 +1,168 @@
+from BoardGenerator import BoardGenerator
+from Corpus import CorpusReader, CorpusWriter
+from Hints import HintEngine
+from Solvers import SatSolver
+from collections import namedtuple, Counter
+from copy import deepcopy
+from time import time
+import multiprocessing
+import argparse
+
+
+# grade is the 1-based index of the hardest technique needed in HintEngine.TECHNIQUES, or one past the last technique
+# for boards which need guessing. counts maps each technique to the number of times it was used
+Rating = namedtuple('Rating', ['tier', 'grade', 'technique', 'counts'])
+
+
+class Rater:
+    """
+    Rates how hard a board is for a human player. The board is solved the way a person would, by always applying the
+    easiest technique of the HintEngine that makes progress, and it is graded by the hardest technique that was needed.
+    Boards which the techniques cannot finish need guessing, unless they have more than one solution, in which case no
+    amount of skill can finish them and they are rated ambiguous. Boards which run into a contradiction have no solution.
+    Unlike the time a solver takes, the rating is the same on every machine and every run
+    """
+
+    EASY = 'easy'
+    MEDIUM = 'medium'
+    HARD = 'hard'
+    FIENDISH = 'fiendish'
+    AMBIGUOUS = 'ambiguous'  # More than one solution
+    INVALID = 'invalid'  # No solution
+    TIERS = [EASY, MEDIUM, HARD, FIENDISH, AMBIGUOUS, INVALID]
+
+    GUESSING = 'guessing'
+    TECHNIQUE_TIERS = {
+        HintEngine.NAKED_SINGLE: EASY,
+        HintEngine.HIDDEN_SINGLE: EASY,
+        HintEngine.LOCKED_CANDIDATES: MEDIUM,
+        HintEngine.NAKED_PAIR: HARD,
+        HintEngine.HIDDEN_PAIR: HARD,
+    }
+
+    CHUNK_SIZE = 256  # The number of boards each worker process rates at a time
+
+    @staticmethod
+    def rate(board):
+        """Returns the Rating of the given board. The board itself is left unchanged"""
+        engine = HintEngine(deepcopy(board))
+        finders = engine.get_technique_finders()
+        counts = Counter()
+        if engine.find_mistake() is not None:
+            return Rating(Rater.INVALID, None, None, counts)
+
+        grade = 0
+        while engine.board.empty_cells:
+            for level, find in enumerate(finders, start=1):
+                hint = find()
+                if hint is not None:
+                    break
+            else:  # No technique applies, so the player would have to guess, unless the board has no single solution
+                solutions = 0 if engine.find_mistake() is not None else SatSolver(engine.board).count_solutions(2)
+                if solutions == 0:
+                    return Rating(Rater.INVALID, None, None, counts)
+                if solutions > 1:
+                    return Rating(Rater.AMBIGUOUS, None, None, counts)
+                return Rating(Rater.FIENDISH, len(finders) + 1, Rater.GUESSING, counts)
+            counts[hint.technique] += 1
+            grade = max(grade, level)
+            engine.apply_hint(hint)
+
+        technique = HintEngine.TECHNIQUES[grade - 1] if grade else None
+        return Rating(Rater.TECHNIQUE_TIERS.get(technique, Rater.EASY), grade, technique, counts)
+
+
+def rate_generated_chunk(task):
+    """
+    Generates and rates one chunk of boards. Runs in a worker process
+    :param task: A (size, clue_ratio, seed, count) tuple
+    :return: A list of (cells, Rating) pairs
+    """
+    size, clue_ratio, seed, count = task
+    generator = BoardGenerator((size, size), clue_ratio=clue_ratio, seed=seed)
+    results = []
+    for _ in range(count):
+        board = generator.generate_new_board()
+        results.append((bytes(board.cells), Rater.rate(board)))
+    return results
+
+
+def rate_corpus_chunk(task):
+    """
+    Rates one chunk of the boards of a corpus file. Runs in a worker process
+    :param task: A (corpus_path, start, stop) tuple
+    :return: A list of (cells, Rating) pairs
+    """
+    corpus_path, start, stop = task
+    with CorpusReader(corpus_path) as corpus:
+        return [(bytes(board.cells), Rater.rate(board)) for board in corpus[start:stop]]
+
+
+def rate_in_parallel(chunk_function, tasks, processes=None):
+    """Runs the chunk function on every task in a process pool, and yields the (cells, Rating) pairs in order"""
+    with multiprocessing.Pool(processes) as pool:
+        for results in pool.imap(chunk_function, tasks):
+            yield from results
+
+
+def rate_generated(size, count, clue_ratio=BoardGenerator.DEFAULT_CLUE_RATIO, seed=0, processes=None,
+                   chunk_size=Rater.CHUNK_SIZE):
+    """
+    Generates and rates count boards across a pool of processes. Every chunk of boards is generated from its own seed,
+    so the same boards are produced no matter how many processes are used
+    :return: A generator of (cells, Rating) pairs
+    """
+    tasks = [(size, clue_ratio, f'{seed}-{chunk}', min(chunk_size, count - start))
+             for chunk, start in enumerate(range(0, count, chunk_size))]
+    return rate_in_parallel(rate_generated_chunk, tasks, processes)
+
+
+def rate_corpus(corpus_path, processes=None, chunk_size=Rater.CHUNK_SIZE):
+    """
+    Rates every board of a corpus file across a pool of processes
+    :return: A generator of (cells, Rating) pairs
+    """
+    with CorpusReader(corpus_path) as corpus:
+        count = len(corpus)
+    tasks = [(corpus_path, start, min(start + chunk_size, count)) for start in range(0, count, chunk_size)]
+    return rate_in_parallel(rate_corpus_chunk, tasks, processes)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser('Rate the difficulty of generated boards, or of the boards of a corpus file')
+    parser.add_argument('--size', type=int, dest='size', default=9)
+    parser.add_argument('-n', '--count', type=int, dest='count', default=1000)
+    parser.add_argument('--clue-ratio', type=float, dest='clue_ratio', default=BoardGenerator.DEFAULT_CLUE_RATIO)
+    parser.add_argument('--seed', type=int, dest='seed', default=0)
+    parser.add_argument('--corpus', type=str, dest='corpus', default=None, help='Rate the boards of this corpus file instead')
+    parser.add_argument('-p', '--processes', type=int, dest='processes', default=None)
+    parser.add_argument('--out', type=str, dest='out', default=None,
+                        help='Write the boards of every tier to the corpus file <out>_<tier>.sdkc')
+    args = parser.parse_args()
+
+    if args.corpus:
+        with CorpusReader(args.corpus) as reader:
+            geometry = reader.geometry
+        ratings = rate_corpus(args.corpus, args.processes)
+    else:
+        geometry = BoardGenerator((args.size, args.size)).generate_new_board().geometry
+        ratings = rate_generated(args.size, args.count, args.clue_ratio, args.seed, args.processes)
+
+    writers = dict()
+    if args.out:
+        writers = {tier: CorpusWriter(f'{args.out}_{tier}.sdkc', (geometry.height, geometry.width),
+                                      (geometry.box_height, geometry.box_width)) for tier in Rater.TIERS}
+    tiers = Counter()
+    start = time()
+    for cells, rating in ratings:
+        tiers[rating.tier] += 1
+        if writers:
+            writers[rating.tier].append_cells(cells)
+    elapsed = time() - start
+    for writer in writers.values():
+        writer.close()
+
+    total = sum(tiers.values())
+    for tier in Rater.TIERS:
+        print(f'{tier:>10} {tiers[tier]:>10}')
+    print(f'Rated {total} boards in {elapsed:.2f} seconds ({total / elapsed * 3600:,.0f} boards per hour)')
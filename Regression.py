@@ -0,0 +1,347 @@
+from Board import Board
+from BoardGenerator import BoardGenerator
+from Hints import HintEngine
+from Solvers import Solver, get_solver
+from copy import deepcopy
+from datetime import datetime
+from math import exp, lgamma, log, sqrt
+from statistics import mean, median, variance
+from time import perf_counter
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tracemalloc
+
+
+def regularized_incomplete_beta(a, b, x):
+    """Returns the regularized incomplete beta function I_x(a, b), evaluated with Lentz's continued fraction"""
+    if x <= 0:
+        return 0.0
+    if x >= 1:
+        return 1.0
+    if x > (a + 1) / (a + b + 2):  # The continued fraction converges quickly only below this point
+        return 1 - regularized_incomplete_beta(b, a, 1 - x)
+
+    tiny = 1e-300
+    front = exp(lgamma(a + b) - lgamma(a) - lgamma(b) + a * log(x) + b * log(1 - x)) / a
+    c, d = 1.0, 1 - (a + b) * x / (a + 1)
+    d = 1 / (d if abs(d) > tiny else tiny)
+    fraction = d
+    for m in range(1, 300):
+        for numerator in (m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+                          -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1))):
+            d = 1 + numerator * d
+            d = 1 / (d if abs(d) > tiny else tiny)
+            c = 1 + numerator / c
+            c = c if abs(c) > tiny else tiny
+            fraction *= c * d
+        if abs(c * d - 1) < 1e-12:
+            break
+    return front * fraction
+
+
+def welch_t_test(sample, other_sample):
+    """Returns the two-sided p-value of Welch's t-test, which checks whether two samples have different means"""
+    variance_of_mean = variance(sample) / len(sample)
+    other_variance_of_mean = variance(other_sample) / len(other_sample)
+    total_variance = variance_of_mean + other_variance_of_mean
+    if total_variance == 0:
+        return 1.0 if mean(sample) == mean(other_sample) else 0.0
+    t = (mean(sample) - mean(other_sample)) / sqrt(total_variance)
+    degrees_of_freedom = total_variance ** 2 / (variance_of_mean ** 2 / (len(sample) - 1) +
+                                                other_variance_of_mean ** 2 / (len(other_sample) - 1))
+    return regularized_incomplete_beta(degrees_of_freedom / 2, 0.5, degrees_of_freedom / (degrees_of_freedom + t * t))
+
+
+def get_commit():
+    """Returns the current git commit, with a '-dirty' suffix if the working tree has uncommitted changes"""
+    repository = os.path.dirname(os.path.abspath(__file__))
+    commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, cwd=repository).stdout.strip()
+    dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], capture_output=True, text=True,
+                           cwd=repository).stdout.strip()
+    return (commit or 'unknown') + ('-dirty' if dirty else '')
+
+
+class Regression:
+    """
+    A fixed set of micro benchmarks (is_legal, candidate generation, legal value updates, hints) and macro benchmarks
+    (full solves with each deterministic solver and with learning, board generation) used to catch performance regressions before a
+    release. Every benchmark is timed several times, and then run several more times under tracemalloc for its peak
+    memory, which varies between runs as well since it depends on when the garbage collector runs.
+    Results are stored as JSON baselines keyed by git commit, and a benchmark is flagged when Welch's t-test finds
+    it significantly slower than the baseline, or significantly more memory hungry. Either way, the change must also be
+    large enough to matter: MIN_SLOWDOWN for time and MIN_MEMORY_GROWTH for memory
+    """
+
+    DEFAULT_BASELINES_PATH = 'regression_baselines.json'
+    DEFAULT_REPEATS = 7
+    MEMORY_REPEATS = 5  # The number of runs under tracemalloc, which are slow. Capped by the number of timed runs
+    ALPHA = 0.01  # The significance level of the t-tests
+    MIN_SLOWDOWN = 0.05  # Significant slowdowns smaller than this are too small to flag
+    MIN_MEMORY_GROWTH = 0.10  # Significant growths of the peak memory smaller than this are too small to flag
+    SOLVERS = [Solver.BACKTRACKING_SOLVER, Solver.MRV_SOLVER, Solver.LCV_SOLVER, Solver.FORWARD_CHECKING_SOLVER,
+               Solver.SAT_SOLVER]  # The solvers whose runs are deterministic and stay in one process
+    SOLVE_SIZES = [(9, 0.4), (16, 0.6)]  # (board size, clue ratio) pairs
+    SOLVE_COUNT = 3
+    SEED = 0
+
+    def __init__(self, repeats=DEFAULT_REPEATS, name_filter=None):
+        """
+        :param repeats: The number of timed runs of every benchmark
+        :param name_filter: If given, only benchmarks whose name contains this string are run
+        """
+        self.repeats = repeats
+        self.name_filter = name_filter
+
+    @staticmethod
+    def get_boards(size, clue_ratio, count):
+        generator = BoardGenerator((size, size), clue_ratio=clue_ratio, seed=Regression.SEED)
+        return [generator.generate_new_board() for _ in range(count)]
+
+    @staticmethod
+    def is_legal_benchmark(size):
+        board = Regression.get_boards(size, 0.5, 1)[0]
+        coords, valid_nums = board.geometry.cell_coords, board.valid_nums
+
+        def run():
+            for _ in range(20):
+                for row, col in coords:
+                    for num in valid_nums:
+                        board.is_legal(row, col, num)
+        return run
+
+    @staticmethod
+    def candidates_benchmark(size):
+        board = Regression.get_boards(size, 0.5, 1)[0]
+
+        def run():
+            for _ in range(50):
+                for row, col in board.geometry.cell_coords:
+                    board.get_legal_nums_for_cell(row, col)
+        return run
+
+    @staticmethod
+    def update_legal_values_benchmark(size):
+        board = Regression.get_boards(size, 0.5, 1)[0]
+        solver = get_solver(Solver.MRV_SOLVER, board)
+        moves = [(row, col, solver.legal_values[(row, col)][0]) for row, col in list(solver.legal_values)[:size]
+                 if solver.legal_values[(row, col)]]
+
+        def run():
+            for _ in range(20):
+                for row, col, num in moves:
+                    solver.do_move(row, col, num)
+                for row, col, num in reversed(moves):
+                    solver.do_move(row, col, num, setting_num=False)
+                solver.steps.clear()
+        return run
+
+    @staticmethod
+    def hints_benchmark(size):
+        boards = Regression.get_boards(size, 0.5, 5)
+
+        def run():
+            for board in boards:
+                engine = HintEngine(deepcopy(board))
+                for _ in range(20):
+                    hint = engine.next_hint()
+                    if hint is None or hint.technique == HintEngine.MISTAKE:
+                        break
+                    engine.apply_hint(hint)
+        return run
+
+    @staticmethod
+    def solve_benchmark(solver_name, size, clue_ratio):
+        boards = Regression.get_boards(size, clue_ratio, Regression.SOLVE_COUNT)
+
+        def run():
+            for board in boards:
+                Regression.check_solved(get_solver(solver_name, deepcopy(board)), board)
+        return run
+
+    @staticmethod
+    def learning_benchmark(size, clue_ratio):
+        """
+        Solves the same boards as macro.solve.backtracking, plus an empty board, with learning enabled, so the two
+        benchmarks' times show what learning gains. Plain backtracking is used since it fails far more often than the
+        other solvers, and learning only pays off after failures. Raises a RuntimeError if learning stops saving nodes
+        """
+        boards = Regression.get_boards(size, clue_ratio, Regression.SOLVE_COUNT)
+        empty_board = Board((size, size))
+        empty_board.set_board([[0] * size for _ in range(size)])  # The empty board hashes to 0, see TranspositionTable
+        boards.append(empty_board)
+        plain_nodes = 0
+        for board in boards:
+            solver = get_solver(Solver.BACKTRACKING_SOLVER, deepcopy(board))
+            solver.solve_board()
+            plain_nodes += solver.get_nodes_explored()
+
+        def run():
+            nodes = 0
+            for board in boards:
+                solver = get_solver(Solver.BACKTRACKING_SOLVER, deepcopy(board))
+                solver.enable_learning()
+                Regression.check_solved(solver, board)
+                nodes += solver.get_nodes_explored()
+            if nodes >= plain_nodes:
+                raise RuntimeError(f'Learning explored {nodes} nodes on the {size}x{size} boards, '
+                                   f'but plain backtracking only needs {plain_nodes}')
+        return run
+
+    @staticmethod
+    def check_solved(solver, board):
+        """Runs the solver, and raises a RuntimeError if it does not solve the board, since a wrong answer is a regression too"""
+        solved_board = solver.solve_board()
+        if not solver.was_solved() or not solved_board.valid_complete_board():
+            raise RuntimeError(f'{type(solver).__name__} failed to solve the {board.height}x{board.width} board\n{board}')
+
+    @staticmethod
+    def generate_benchmark(size):
+        def run():
+            generator = BoardGenerator((size, size), seed=Regression.SEED)
+            for _ in range(200):
+                generator.generate_new_board()
+        return run
+
+    @staticmethod
+    def get_benchmarks():
+        """Returns a dict mapping every benchmark's name to a function which sets it up and returns the function to time"""
+        benchmarks = dict()
+        for size in (9, 16):
+            benchmarks[f'micro.is_legal.{size}'] = lambda size=size: Regression.is_legal_benchmark(size)
+            benchmarks[f'micro.candidates.{size}'] = lambda size=size: Regression.candidates_benchmark(size)
+            benchmarks[f'micro.update_legal_values.{size}'] = lambda size=size: Regression.update_legal_values_benchmark(size)
+            benchmarks[f'micro.hints.{size}'] = lambda size=size: Regression.hints_benchmark(size)
+        for solver_name in Regression.SOLVERS:
+            for size, clue_ratio in Regression.SOLVE_SIZES:
+                benchmarks[f'macro.solve.{solver_name}.{size}'] = \
+                    lambda solver_name=solver_name, size=size, clue_ratio=clue_ratio: \
+                    Regression.solve_benchmark(solver_name, size, clue_ratio)
+        for size, clue_ratio in Regression.SOLVE_SIZES:
+            benchmarks[f'macro.solve.learning.{size}'] = \
+                lambda size=size, clue_ratio=clue_ratio: Regression.learning_benchmark(size, clue_ratio)
+        for size in (9, 16, 25):
+            benchmarks[f'macro.generate.{size}'] = lambda size=size: Regression.generate_benchmark(size)
+        return benchmarks
+
+    def measure(self, make_benchmark):
+        """
+        Sets up a benchmark, warms it up, and times it
+        :return: A dict holding the seconds taken by every timed run, and the peak memory in bytes allocated during
+                 every traced run
+        """
+        run = make_benchmark()
+        run()
+        times = []
+        for _ in range(self.repeats):
+            start = perf_counter()
+            run()
+            times.append(perf_counter() - start)
+
+        peak_memories = []
+        for _ in range(min(self.repeats, Regression.MEMORY_REPEATS)):  # Tracing slows everything down, so it has its own runs
+            gc.collect()
+            tracemalloc.start()
+            try:
+                run()
+                peak_memories.append(tracemalloc.get_traced_memory()[1])
+            finally:
+                tracemalloc.stop()
+        return {'times': times, 'peak_memories': peak_memories}
+
+    def run(self):
+        """Runs every selected benchmark and returns the results, ready to be stored as a baseline"""
+        results = dict()
+        for name, make_benchmark in Regression.get_benchmarks().items():
+            if self.name_filter and self.name_filter not in name:
+                continue
+            results[name] = self.measure(make_benchmark)
+            print(f'{name:>32} {median(results[name]["times"]) * 1000:>10.2f} ms '
+                  f'{median(results[name]["peak_memories"]) / 1024:>10.1f} KiB', flush=True)
+        return {
+            'commit': get_commit(),
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'repeats': self.repeats,
+            'benchmarks': results,
+        }
+
+    @staticmethod
+    def load_baselines(path):
+        """Returns the dict of stored baselines, keyed by commit"""
+        if not os.path.exists(path):
+            return dict()
+        with open(path) as baselines_file:
+            return json.load(baselines_file)
+
+    @staticmethod
+    def save_baseline(path, result):
+        """Stores a result as the baseline of its commit, replacing any earlier baseline of the same commit"""
+        baselines = Regression.load_baselines(path)
+        baselines[result['commit']] = result
+        with open(path, 'w') as baselines_file:
+            json.dump(baselines, baselines_file, indent=2)
+
+    @staticmethod
+    def compare(baseline, result):
+        """
+        Compares a result to a baseline, and prints one line per benchmark the two have in common
+        :return: The names of the benchmarks which regressed in time or in peak memory
+        """
+        regressions = []
+        print(f'Comparing {result["commit"]} to the baseline of {baseline["commit"]}')
+        print(f'{"benchmark":>32} {"before ms":>10} {"after ms":>10} {"change":>8} {"p-value":>8} {"memory":>8} {"p-value":>8}')
+        for name, current in result['benchmarks'].items():
+            if name not in baseline['benchmarks']:
+                continue
+            before = baseline['benchmarks'][name]
+            time_change = median(current['times']) / median(before['times']) - 1
+            p_value = welch_t_test(before['times'], current['times'])
+            memory_change = median(current['peak_memories']) / max(median(before['peak_memories']), 1) - 1
+            memory_p_value = welch_t_test(before['peak_memories'], current['peak_memories'])
+            flags = []
+            if p_value < Regression.ALPHA and time_change > Regression.MIN_SLOWDOWN:
+                flags.append('SLOWER')
+            if memory_p_value < Regression.ALPHA and memory_change > Regression.MIN_MEMORY_GROWTH:
+                flags.append('MORE MEMORY')
+            if flags:
+                regressions.append(name)
+            print(f'{name:>32} {median(before["times"]) * 1000:>10.2f} {median(current["times"]) * 1000:>10.2f} '
+                  f'{time_change:>+8.1%} {p_value:>8.4f} {memory_change:>+8.1%} {memory_p_value:>8.4f} {" ".join(flags)}')
+        return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser('Run the performance regression benchmarks and compare them to a stored baseline')
+    parser.add_argument('--baselines', type=str, dest='baselines', default=Regression.DEFAULT_BASELINES_PATH)
+    parser.add_argument('--baseline', type=str, dest='baseline', default=None,
+                        help='The commit to compare to. Defaults to the most recently stored baseline of another commit')
+    parser.add_argument('--save', action='store_true', dest='save', help='Store the results as the baseline of the current commit')
+    parser.add_argument('-r', '--repeats', type=int, dest='repeats', default=Regression.DEFAULT_REPEATS)
+    parser.add_argument('-k', '--filter', type=str, dest='name_filter', default=None, help='Only run benchmarks whose name contains this')
+    args = parser.parse_args()
+
+    result = Regression(args.repeats, args.name_filter).run()
+    baselines = Regression.load_baselines(args.baselines)
+    others = [baseline for commit, baseline in baselines.items() if commit != result['commit']]
+    if args.baseline:
+        baseline = baselines.get(args.baseline)
+        if baseline is None:
+            sys.exit(f'There is no baseline for {args.baseline} in {args.baselines}')
+    else:
+        baseline = max(others, key=lambda stored: stored['date'], default=None)
+
+    regressions = []
+    if baseline is not None:
+        regressions = Regression.compare(baseline, result)
+    else:
+        print('There is no baseline to compare to yet')
+    if args.save:
+        Regression.save_baseline(args.baselines, result)
+        print(f'Saved the results as the baseline of {result["commit"]} in {args.baselines}')
+    if regressions:
+        sys.exit(f'{len(regressions)} benchmarks regressed: {", ".join(regressions)}')
@@ -0,0 +1,132 @@
+from collections import namedtuple
+from Solvers import StoredSolver, get_solver
+import argparse
+import csv
+import sqlite3
+
+
+StoredSolution = namedtuple('StoredSolution', ['solution', 'solver_name', 'nodes', 'solve_time'])
+
+
+class SolutionStore:
+    """
+    A persistent store of solved boards, backed by SQLite. Each solution is keyed by the fingerprint of the
+    board it solves (see Board.fingerprint()), and is stored along with the solver used, the number of nodes
+    the search visited and the time it took. Lookups go through the table's primary key index, so they stay
+    well under a millisecond even with millions of entries.
+    Call solve() instead of get_solver(...).solve_board() to only search for boards that were never solved before
+    """
+
+    EXPORT_FIELDS = ['fingerprint', 'solution', 'solver', 'nodes', 'solve_time']
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS solutions ('
+            'fingerprint BLOB PRIMARY KEY, solution BLOB NOT NULL, solver TEXT NOT NULL, '
+            'nodes INTEGER NOT NULL, solve_time REAL NOT NULL'
+            ') WITHOUT ROWID'
+        )
+        self.connection.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM solutions').fetchone()[0]
+
+    def lookup(self, board):
+        """Returns the StoredSolution for the board's current layout, or None if it was never stored"""
+        row = self.connection.execute(
+            'SELECT solution, solver, nodes, solve_time FROM solutions WHERE fingerprint = ?', (board.fingerprint(),)
+        ).fetchone()
+        if row is None:
+            return None
+        return StoredSolution(*row)
+
+    def save(self, solver_name, solver):
+        """Stores the solution found by a Solver object which has already run solve_board(). Unsolved boards are not stored"""
+        if not solver.was_solved():
+            return
+        with self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO solutions VALUES (?, ?, ?, ?, ?)',
+                (solver.original_board.fingerprint(), bytes(solver.board.cells), solver_name,
+                 solver.get_nodes_explored(), solver.get_time_used_to_solve())
+            )
+
+    def solve(self, solver_name, board):
+        """
+        Returns a solved Solver object for the given board. If the board's solution is already stored it is loaded
+        into the board and held by a StoredSolver, so that no solver has to be set up; otherwise the board is solved
+        in place and the new solution is stored
+        """
+        stored = self.lookup(board)
+        if stored is not None:
+            solver = StoredSolver(board, stored.solver_name)
+            solver.load_solution(stored.solution, stored.nodes, stored.solve_time)
+            return solver
+        solver = get_solver(solver_name, board)
+        solver.solve_board()
+        self.save(solver_name, solver)
+        return solver
+
+    def bulk_import(self, entries):
+        """
+        Stores many solutions in a single transaction
+        :param entries: An iterable of (fingerprint, solution, solver_name, nodes, solve_time) tuples
+        :return: The number of entries in the store afterwards
+        """
+        with self.connection:
+            self.connection.executemany('INSERT OR REPLACE INTO solutions VALUES (?, ?, ?, ?, ?)', entries)
+        return len(self)
+
+    def export(self):
+        """Returns a generator of every stored (fingerprint, solution, solver_name, nodes, solve_time) tuple"""
+        yield from self.connection.execute('SELECT fingerprint, solution, solver, nodes, solve_time FROM solutions')
+
+    def export_to_csv(self, path):
+        """Writes every stored solution to a CSV file, with the binary fields hex encoded. Returns the number of rows written"""
+        count = 0
+        with open(path, 'w', newline='') as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(SolutionStore.EXPORT_FIELDS)
+            for fingerprint, solution, solver_name, nodes, solve_time in self.export():
+                writer.writerow([fingerprint.hex(), solution.hex(), solver_name, nodes, solve_time])
+                count += 1
+        return count
+
+    def import_from_csv(self, path):
+        """Stores every solution in a CSV file written by export_to_csv(). Returns the number of entries in the store afterwards"""
+        with open(path, newline='') as csv_file:
+            reader = csv.DictReader(csv_file)
+            return self.bulk_import(
+                (bytes.fromhex(row['fingerprint']), bytes.fromhex(row['solution']), row['solver'],
+                 int(row['nodes']), float(row['solve_time']))
+                for row in reader
+            )
+
+    def close(self):
+        self.connection.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser('Import or export the solutions of a solution store')
+    parser.add_argument('store_path')
+    parser.add_argument('command', choices=['import', 'export', 'count'])
+    parser.add_argument('csv_path', nargs='?', default=None)
+    args = parser.parse_args()
+
+    with SolutionStore(args.store_path) as store:
+        if args.command == 'import':
+            print(f'The store now holds {store.import_from_csv(args.csv_path)} solutions')
+        elif args.command == 'export':
+            print(f'Exported {store.export_to_csv(args.csv_path)} solutions to {args.csv_path}')
+        else:
+            print(f'The store holds {len(store)} solutions')
@@ -1,8 +1,17 @@
 from Board import Board
+from CDCL import CDCL
+from Checkpoint import Checkpoint, CheckpointState
 from copy import deepcopy
 from time import time
+from random import Random
+from array import array
+from collections import OrderedDict, Counter, deque
+from threading import Lock
+import queue
 import heapq
+import json
 import abc
+import os
 
 
 class PriorityQueue:
@@ -37,14 +46,179 @@ class PriorityQueue:
         return in_order
 
 
+zobrist_keys = dict()  # Maps each Geometry to its Zobrist keys, see get_zobrist_keys()
+
+
+def get_zobrist_keys(geometry):
+    """
+    Returns the shared Zobrist keys of a geometry: one random 64 bit key per (cell, num) pair, stored flat at
+    index * geometry.count_stride + num. XORing the keys of every filled cell gives a hash of the assignment
+    """
+    if geometry not in zobrist_keys:
+        generator = Random(str(geometry.get_shape()))
+        zobrist_keys[geometry] = array('Q', (generator.getrandbits(64) for _ in range(geometry.num_cells * geometry.count_stride)))
+    return zobrist_keys[geometry]
+
+
+class TranspositionTable:
+    """
+    A fixed size table of the Zobrist hashes of partial assignments known to have no solution.
+    Each hash has a single slot (chosen by its low bits) and always replaces whatever was stored there,
+    so memory stays bounded at 8 bytes per slot no matter how long the search runs.
+    Hashes are stored with their lowest bit set, so an empty slot (0) never matches a hash, not even the hash 0
+    of an empty board
+    """
+
+    DEFAULT_CAPACITY = 1 << 16
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        """:param capacity: The number of slots. Rounded up to a power of two"""
+        size = 1 << max(capacity - 1, 1).bit_length()
+        self.mask = size - 1
+        self.keys = array('Q', bytes(8 * size))
+        self.lookups = 0
+        self.hits = 0
+        self.stores = 0
+
+    def __contains__(self, key):
+        self.lookups += 1
+        if self.keys[key & self.mask] == key | 1:
+            self.hits += 1
+            return True
+        return False
+
+    def store(self, key):
+        """Records that the assignment with the given hash has no solution"""
+        self.keys[key & self.mask] = key | 1
+        self.stores += 1
+
+    def get_hit_rate(self):
+        """Returns the fraction of lookups which found a dead assignment"""
+        return self.hits / self.lookups if self.lookups else 0
+
+
+class NogoodStore:
+    """
+    Stores nogoods: sets of (cell index, num) assignments which can never all hold in a solution.
+    Like the clauses in CDCL, every nogood watches two of its assignments which do not currently hold, and is only
+    looked at when one of those gets placed, so a search can tell in O(1) whether its current assignment contains a
+    known nogood. The oldest nogoods are forgotten once max_size is reached
+    """
+
+    DEFAULT_MAX_SIZE = 10000
+
+    def __init__(self, max_size=DEFAULT_MAX_SIZE):
+        self.max_size = max_size
+        self.nogoods = OrderedDict()  # Maps each nogood's id to its list of (index, num) assignments, watched ones first
+        self.ids = dict()  # Maps each stored nogood (as a frozenset) back to its id
+        self.watchers = dict()  # Maps each (index, num) assignment to the ids of the nogoods watching it
+        self.violated = set()  # The ids of the nogoods whose assignments all currently hold
+        self.next_id = 0
+        self.cells = None
+
+    def attach(self, cells):
+        """Starts tracking the given cells (a bytearray), re-choosing the watched assignments of every stored nogood"""
+        self.cells = cells
+        self.violated = set()
+        self.watchers = dict()
+        for nogood_id in self.nogoods:
+            self.watch(nogood_id)
+
+    def watch(self, nogood_id):
+        """Moves assignments which do not hold to the front of the nogood and watches the first two of them"""
+        nogood = self.nogoods[nogood_id]
+        nogood.sort(key=lambda assignment: self.cells[assignment[0]] == assignment[1])
+        for assignment in nogood[:2]:
+            self.watchers.setdefault(assignment, set()).add(nogood_id)
+        index, num = nogood[0]
+        if self.cells[index] == num:
+            self.violated.add(nogood_id)
+
+    def add(self, nogood):
+        """Stores a nogood given as an iterable of (index, num) pairs"""
+        key = frozenset(nogood)
+        if not key or key in self.ids:
+            return
+        if len(self.nogoods) >= self.max_size:
+            self.remove(next(iter(self.nogoods)))
+        nogood_id = self.next_id
+        self.next_id += 1
+        self.nogoods[nogood_id] = list(key)
+        self.ids[key] = nogood_id
+        self.watch(nogood_id)
+
+    def remove(self, nogood_id):
+        """Forgets a stored nogood"""
+        nogood = self.nogoods.pop(nogood_id)
+        del self.ids[frozenset(nogood)]
+        for assignment in nogood[:2]:
+            self.watchers[assignment].discard(nogood_id)
+        self.violated.discard(nogood_id)
+
+    def update(self, index, num, assigned):
+        """Must be called whenever num is placed in (assigned=True) or removed from (assigned=False) the cell"""
+        if not assigned:
+            # Removing a placement never breaks the watches, it can only end a violation
+            if self.violated:
+                self.violated = {nogood_id for nogood_id in self.violated
+                                 if (index, num) not in self.nogoods[nogood_id]}
+            return
+        nogood_ids = self.watchers.get((index, num))
+        if not nogood_ids:
+            return
+        cells = self.cells
+        for nogood_id in list(nogood_ids):
+            nogood = self.nogoods[nogood_id]
+            if len(nogood) == 1:
+                self.violated.add(nogood_id)
+                continue
+            # Make sure the placed assignment is nogood[1], so nogood[0] is the other watched one
+            if nogood[0] == (index, num):
+                nogood[0], nogood[1] = nogood[1], nogood[0]
+            for k in range(2, len(nogood)):
+                other_index, other_num = nogood[k]
+                if cells[other_index] != other_num:  # Found a new assignment to watch
+                    nogood[1], nogood[k] = nogood[k], nogood[1]
+                    nogood_ids.discard(nogood_id)
+                    self.watchers.setdefault(nogood[1], set()).add(nogood_id)
+                    break
+            else:
+                other_index, other_num = nogood[0]
+                if cells[other_index] == other_num:
+                    self.violated.add(nogood_id)
+
+    def get_violated(self):
+        """Returns one of the nogoods whose assignments all currently hold"""
+        return self.nogoods[next(iter(self.violated))]
+
+
+class NodeLimitReached(Exception):
+    """Raised by a Solver when its search visits more nodes than its node_limit allows"""
+    pass
+
+
+class SearchStopped(Exception):
+    """Raised by a Solver when its stop_event is set while it searches"""
+    pass
+
+
 class Solver(abc.ABC):
 
     LCV_SOLVER = 'lcv'
     BACKTRACKING_SOLVER = 'backtracking'
     MRV_SOLVER = 'mrv'
     FORWARD_CHECKING_SOLVER = 'fcs'
+    PORTFOLIO_SOLVER = 'portfolio'
+    RESTARTING_SOLVER = 'restarts'
+    SAT_SOLVER = 'sat'
+    PARALLEL_SOLVER = 'parallel'
 
-    SOLVERS = [BACKTRACKING_SOLVER, MRV_SOLVER, LCV_SOLVER, FORWARD_CHECKING_SOLVER]
+    SOLVERS = [BACKTRACKING_SOLVER, MRV_SOLVER, LCV_SOLVER, FORWARD_CHECKING_SOLVER, PORTFOLIO_SOLVER, RESTARTING_SOLVER,
+               SAT_SOLVER, PARALLEL_SOLVER]
+
+    DEFAULT_CHECKPOINT_INTERVAL = 60  # Seconds
+    CHECKPOINT_CHECK_NODES = 1000  # The clock is only read once every this many nodes
+    MAX_CHECKPOINT_OVERHEAD = 0.01  # Checkpoints are spaced out so that writing them takes at most this fraction of the time
 
     def __init__(self, board: Board):
         self.board = board
@@ -52,6 +226,25 @@ class Solver(abc.ABC):
         self.solved = False
         self.steps = []  # Stores all of the steps
         self.time_used = 0
+        self.nodes = 0  # The number of nodes of the search tree visited
+        self.node_limit = None  # If set, the search raises NodeLimitReached once it visits more nodes than this
+        self.stop_event = None  # If set to a threading.Event, the search raises SearchStopped once the event is set
+        self.random = None  # If set to a Random object, ties between cells and values are broken randomly
+        self.learning = False  # Whether dead assignments are remembered, see self.enable_learning()
+        self.transposition_table = None
+        self.nogoods = None
+        self.zobrist_keys = None
+        self.zobrist_hash = 0
+        self.pruned = 0  # The number of nodes cut off because their assignment was known to be dead
+        self.backjumps = 0  # The number of cells skipped over because their value played no part in a failure below them
+        self.conflict = None  # After a failed subtree, the set of (index, num) moves which caused it, or None if unknown
+        self.trail = []  # The open choice points of the search, as [row, col, values, position of the value being tried]
+        self.resume_frames = None  # The choice points to resume the search from, see resume_solver()
+        self.start_time = None
+        self.checkpoint_path = None  # If set, the search state is saved to this file periodically
+        self.checkpoint_interval = Solver.DEFAULT_CHECKPOINT_INTERVAL
+        self.next_checkpoint_node = 0
+        self.next_checkpoint_time = 0
 
     def was_solved(self):
         """Returns False unless a solution was found when calling self.solve_board()"""
@@ -72,6 +265,208 @@ class Solver(abc.ABC):
         """Returns the amount of time needed to solve the board"""
         return self.time_used
 
+    def get_nodes_explored(self):
+        """Returns the number of nodes of the search tree visited while solving the board"""
+        return self.nodes
+
+    def get_stats(self):
+        """Returns a dict summarizing the last call to self.solve_board()"""
+        return {
+            'solved': self.solved,
+            'time': self.time_used,
+            'nodes': self.nodes,
+            'steps': len(self.steps),
+            **(self.get_learning_stats() if self.learning else {}),
+        }
+
+    def count_node(self):
+        """Called once for every node of the search tree the solver visits"""
+        if self.checkpoint_path is not None and self.nodes >= self.next_checkpoint_node:
+            self.check_checkpoint()
+        self.nodes += 1
+        if self.node_limit is not None and self.nodes > self.node_limit:
+            raise NodeLimitReached(self.nodes)
+        if self.stop_event is not None and self.stop_event.is_set():
+            raise SearchStopped(self.nodes)
+
+    def enable_learning(self, transposition_table=None, nogoods=None):
+        """
+        Makes the search remember dead ends, so that the same failing subtree is not explored twice when different
+        branch orders lead back to it. Whenever a cell runs out of values, its conflict set is stored as a nogood:
+        only the earlier moves which actually ruled its values out, directly or through the failures below them
+        (see search_values()). When a failure cannot be explained that way (e.g. a cage's sum ruled a value out),
+        the Zobrist hash of the whole failing assignment is stored in a transposition table instead.
+        Nodes whose assignment is in the table or contains a nogood are pruned, and the search backjumps over cells
+        whose value played no part in a failure. Pass existing tables to share what was learned between solvers
+        working on the same board
+        """
+        self.learning = True
+        self.transposition_table = transposition_table or TranspositionTable()
+        self.nogoods = nogoods or NogoodStore()
+        self.nogoods.attach(self.board.cells)
+        self.zobrist_keys = get_zobrist_keys(self.board.geometry)
+        stride = self.board.geometry.count_stride
+        self.zobrist_hash = 0
+        for index, num in enumerate(self.board.cells):
+            if num != 0:
+                self.zobrist_hash ^= self.zobrist_keys[index * stride + num]
+
+    def get_learning_stats(self):
+        """Returns a dict describing how much the transposition table and nogoods pruned"""
+        return {
+            'pruned': self.pruned,
+            'backjumps': self.backjumps,
+            'tt_hit_rate': self.transposition_table.get_hit_rate(),
+            'tt_stores': self.transposition_table.stores,
+            'nogoods': len(self.nogoods.nogoods),
+        }
+
+    def note_move(self, index, num, assigned=True):
+        """Keeps the Zobrist hash and nogood counts in sync with a move. Only called when learning is enabled"""
+        self.zobrist_hash ^= self.zobrist_keys[index * self.board.geometry.count_stride + num]
+        self.nogoods.update(index, num, assigned)
+
+    def is_known_dead(self):
+        """Returns True iff the current assignment is known to have no solution. Sets self.conflict accordingly"""
+        if self.nogoods.violated:
+            self.conflict = set(self.nogoods.get_violated())
+        elif self.transposition_table.stores and self.zobrist_hash in self.transposition_table:
+            self.conflict = None  # The whole assignment is dead, but which moves caused it was not stored
+        else:
+            return False
+        self.pruned += 1
+        return True
+
+    def explain_blocked(self, index, num, conflict):
+        """
+        Adds to the conflict set a move which keeps num out of the cell at index, i.e. a peer holding num.
+        Nums blocked by one of the search's starting numbers need no move, since those always hold, and a blocking move
+        already in the conflict set is preferred, which keeps the set small
+        :return: False iff no peer holds num, so the cell is blocked some other way (e.g. by a cage's sum)
+        """
+        cells, start_cells = self.board.cells, self.original_board.cells
+        blockers = [peer for peer in self.board.geometry.peers[index] if cells[peer] == num]
+        if not blockers:
+            return False
+        if not any(start_cells[peer] == num or (peer, num) in conflict for peer in blockers):
+            conflict.add((blockers[0], num))
+        return True
+
+    def explain_rejected_move(self, index, num, conflict):
+        """
+        Adds to the conflict set the moves which made do_move() reject num in the cell at index.
+        Solvers whose do_move() can reject moves override this
+        :return: False iff the rejection cannot be explained
+        """
+        return False
+
+    def record_dead_end(self, conflict):
+        """
+        Records that the current assignment has no solution, and that neither has any containing the conflict set.
+        A nogood already covers the whole assignment, so the assignment's hash is only stored when there is no conflict set
+        """
+        self.conflict = conflict
+        if conflict is not None:
+            self.nogoods.add(conflict)
+        else:
+            self.transposition_table.store(self.zobrist_hash)
+
+    def enable_checkpoints(self, path, interval=DEFAULT_CHECKPOINT_INTERVAL):
+        """
+        Makes the search save its state to the given file every interval seconds, so that it can be resumed with
+        resume_solver() if the process dies. Only the solvers of CHECKPOINT_SOLVERS, which search through
+        Solver.solve_board_helper(), can be resumed, so any other solver raises a ValueError
+        """
+        if type(self) not in CHECKPOINT_SOLVERS.values():
+            raise ValueError(f'A {type(self).__name__} cannot be resumed from a checkpoint')
+        self.checkpoint_path = path
+        self.checkpoint_interval = interval
+        self.next_checkpoint_node = self.nodes + Solver.CHECKPOINT_CHECK_NODES
+        self.next_checkpoint_time = time() + interval
+
+    def check_checkpoint(self):
+        """Saves a checkpoint if the interval has passed. Called by count_node() before a node is counted"""
+        self.next_checkpoint_node = self.nodes + Solver.CHECKPOINT_CHECK_NODES
+        now = time()
+        if now < self.next_checkpoint_time:
+            return
+        self.save_checkpoint(self.checkpoint_path)
+        write_time = time() - now
+        self.next_checkpoint_time = time() + max(self.checkpoint_interval, write_time / Solver.MAX_CHECKPOINT_OVERHEAD)
+
+    def save_checkpoint(self, path):
+        """Writes the current search state to a checkpoint file. See Checkpoint for the format"""
+        Checkpoint.write(path, self.get_checkpoint_state())
+
+    def get_checkpoint_state(self):
+        """
+        Returns the CheckpointState of the search, which holds:
+            the solver's class name, the board's geometry, the initial clues, the numbers the search started from,
+            the current numbers, the legal values of each empty cell (see get_legal_values_state()),
+            the open choice points as (cell index, position of the value being tried, values) frames,
+            the node and pruned counts, the time used so far, whether learning is enabled, and the random state
+        """
+        width = self.board.width
+        return CheckpointState(
+            type(self).__name__, self.board.geometry, self.board.initial_cells, self.original_board.cells,
+            self.board.cells, self.get_legal_values_state(),
+            [(row * width + col, position, values) for row, col, values, position in self.trail],
+            self.nodes, self.pruned, time() - self.start_time if self.start_time is not None else self.time_used,
+            self.learning, self.random.getstate()[1] if self.random is not None else None,
+        )
+
+    def restore_checkpoint_state(self, state):
+        """
+        Restores the search state of a checkpoint, so that solve_board() continues the search from it. The steps start
+        with the moves leading to the checkpoint, and learned dead ends are not saved, so learning starts over
+        """
+        self.board.set_cells(state.cells)
+        if state.legal_values is not None:
+            self.set_legal_values_state(state.legal_values)
+        self.nodes, self.pruned, self.time_used = state.nodes, state.pruned, state.time_used
+        if state.random_state is not None:
+            self.random = Random()
+            self.random.setstate((3, tuple(state.random_state), None))
+        if state.learning:
+            self.enable_learning()
+        self.resume_frames = [(*divmod(index, self.board.width), list(values), position)
+                              for index, position, values in state.frames]
+        self.steps = [(row, col, values[position]) for row, col, values, position in self.resume_frames]
+
+    def get_legal_values_state(self):
+        """Returns the solver's legal values as (cell index, bitmask) pairs, or None if it does not keep any"""
+        return None
+
+    def set_legal_values_state(self, legal_values):
+        """Restores the legal values returned by get_legal_values_state()"""
+        pass
+
+    def randomize(self, seed=None):
+        """
+        Turns on randomized tie-breaking: values with equal preference are tried in a random order, and so are
+        cells which a solver's heuristic rates as equally good. Solvers which simply fill the first empty cell keep
+        doing so. Pass a seed (or a Random object) to make the order reproducible
+        """
+        self.random = seed if isinstance(seed, Random) else Random(seed)
+
+    def order_values(self, values):
+        """Returns the values in the order they should be tried. When randomized, the values are shuffled"""
+        if self.random is None:
+            return values
+        return self.random.sample(values, len(values))
+
+    def load_solution(self, solution_cells, nodes=0, time_used=0):
+        """
+        Marks the board as solved using a previously found solution, without searching
+        :param solution_cells: The numbers of the solved board as a flat bytes-like object
+        :param nodes: The number of nodes the original search visited
+        :param time_used: The time the original search took
+        """
+        self.board.set_cells(solution_cells)
+        self.solved = True
+        self.nodes = nodes
+        self.time_used = time_used
+
     def get_cell(self):
         """Returns a cell to attempt to fill"""
         return self.board.ERROR, self.board.ERROR
@@ -87,32 +482,99 @@ class Solver(abc.ABC):
         Solves the board stored in memory if possible. Will update the Solver object accordingly if the board was solved
         :return: The board object after solving if a solution is possible; otherwise, returns original board
         """
-        start = time()
-        if self.solve_board_helper():
+        start = time() - self.time_used if self.resume_frames is not None else time()
+        self.start_time = start
+        try:
+            if self.resume_frames is not None:
+                frames, self.resume_frames = self.resume_frames, None
+                self.solved = bool(self.resume_search(frames))
+            else:
+                self.solved = bool(self.solve_board_helper())
+        finally:
             self.time_used = time() - start
-            self.solved = True
+            self.start_time = None
+        if self.solved:
             return self.board
         else:
-            self.time_used = time() - start
             return self.original_board
 
     def solve_board_helper(self):
+        self.count_node()
+        if self.learning and self.is_known_dead():
+            return False
         row, col = self.get_cell()
         if row == self.board.ERROR:  # If there are no more empty cells
             return True
-        for num in self.get_vals_for_cell(row, col):
-            if self.board.is_legal(row, col, num) and self.original_board.board[row][col] == 0:
-                self.do_move(row, col, num)
-                # print(f'Row={row}, Col={col}, Num={num}, Setting_num=True')
-
-                if self.solve_board_helper():
-                    return True
+        return self.search_values(row, col, self.get_vals_for_cell(row, col))
 
-                # print(f'Row={row}, Col={col}, Num={num}, Setting_num=False')
-                self.do_move(row, col, num, setting_num=False)
+    def search_values(self, row, col, values, start=0, resume_frames=None):
+        """
+        Tries each of the values in the given cell in turn, searching the subtree below each one
+        :param start: The position in values to start from
+        :param resume_frames: If given, the value at start is already on the board, and the search below it is resumed
+                              from these choice points (see resume_search())
+        :return: True iff a solution was found
+        """
+        index = row * self.board.width + col
+        frame = [row, col, values, start]
+        self.trail.append(frame)
+        conflict = None
+        if self.learning and resume_frames is None:
+            # The moves which caused the failures of this cell's values. Values left out of the list were never legal
+            conflict = set()
+            for num in set(self.board.valid_nums).difference(values):
+                if conflict is not None and not self.explain_blocked(index, num, conflict):
+                    conflict = None
+        for position in range(start, len(values)):
+            num = values[position]
+            frame[3] = position
+            if resume_frames is not None and position == start:
+                found = self.resume_search(resume_frames)
+            elif self.board.is_legal(row, col, num) and self.original_board.cells[index] == 0:
+                if self.do_move(row, col, num) is False:  # The solver rejected the move, e.g. forward checking found a dead end
+                    if conflict is not None and not self.explain_rejected_move(index, num, conflict):
+                        conflict = None
+                    continue
+                if self.learning:
+                    self.note_move(index, num)
+                # print(f'Row={row}, Col={col}, Num={num}, Setting_num=True')
+                found = self.solve_board_helper()
+            else:
+                if conflict is not None and not self.explain_blocked(index, num, conflict):
+                    conflict = None
+                continue
+            if found:
+                return True
+
+            # print(f'Row={row}, Col={col}, Num={num}, Setting_num=False')
+            self.do_move(row, col, num, setting_num=False)
+            if self.learning:
+                self.note_move(index, num, assigned=False)
+                if self.conflict is not None and (index, num) not in self.conflict:
+                    # The failure below did not depend on this cell, so no other value can fix it: backjump
+                    self.backjumps += 1
+                    self.trail.pop()
+                    return False
+                if conflict is not None and self.conflict is not None:
+                    conflict.update(self.conflict)
+                    conflict.discard((index, num))
+                else:
+                    conflict = None
+        self.trail.pop()
+        if self.learning:
+            self.record_dead_end(conflict)
+        return False
+
+    def resume_search(self, frames):
+        """Continues a search from the (row, col, values, position) choice points saved in a checkpoint, outermost first"""
+        if not frames:
+            return self.solve_board_helper()
+        row, col, values, position = frames[0]
+        return self.search_values(row, col, values, position, frames[1:])
 
     @abc.abstractmethod
     def do_move(self, row, col, num, setting_num=True):
+        """Applies (or with setting_num=False, undoes) a move. May return False to reject the move, leaving the board unchanged"""
         pass
 
 
@@ -125,7 +587,7 @@ class BacktrackingSolver(Solver):
         return self.board.find_empty_cell()
 
     def get_vals_for_cell(self, row, col):
-        return self.board.valid_nums
+        return self.order_values(self.board.valid_nums)
 
     def do_move(self, row, col, num, setting_num=True):
         if setting_num:
@@ -146,15 +608,22 @@ class LegalValuesParent(Solver):
     def __init_legal_values(self):
         """
         Initializes the legal_values dictionary
-        At first, each empty cell can have all nums; each non-empty cell can have no nums
+        At first, each empty cell can have all of its legal nums; each non-empty cell is left out
         """
-        for row in range(self.board.height):
-            for col in range(self.board.width):
-                if self.board.initial_board[row][col] == 0:
-                    self.legal_values[(row, col)] = self.board.get_legal_nums_for_cell(row, col)
+        for index, (row, col) in enumerate(self.board.geometry.cell_coords):
+            if self.board.cells[index] == 0:
+                self.legal_values[(row, col)] = self.board.get_legal_nums_for_cell(row, col)
 
     def get_vals_for_cell(self, row, col):
-        return self.legal_values[(row, col)]
+        return self.order_values(self.legal_values.get((row, col), []))
+
+    def get_legal_values_state(self):
+        width = self.board.width
+        return [(row * width + col, sum(1 << num for num in values)) for (row, col), values in self.legal_values.items()]
+
+    def set_legal_values_state(self, legal_values):
+        coords, valid_nums = self.board.geometry.cell_coords, self.board.valid_nums
+        self.legal_values = {coords[index]: [num for num in valid_nums if mask >> num & 1] for index, mask in legal_values}
 
     def get_cell(self):
         return self.board.find_empty_cell()
@@ -178,43 +647,13 @@ class LegalValuesParent(Solver):
         :param removing: Boolean if we are setting{=True} or resetting{=False} the cell
         """
 
-        # Update legal values for the current cell
-        if removing:
-            self.legal_values.pop((row, col), None)
-        else:
-            self.legal_values[(row, col)] = [num]
-
-        # Update legal values for all other cells in the same row
-        for other_col in range(self.board.width):
-            if other_col != col:
-                vals = self.board.get_legal_nums_for_cell(row, other_col)
-                if len(vals) == 0:
-                    self.legal_values.pop((row, other_col), None)
-                else:
-                    self.legal_values[(row, other_col)] = vals
-
-        # Update legal values for all other cells in the same column
-        for other_row in range(self.board.height):
-            if other_row != row:
-                vals = self.board.get_legal_nums_for_cell(other_row, col)
-                if len(vals) == 0:
-                    self.legal_values.pop((other_row, col), None)
-                else:
-                    self.legal_values[(other_row, col)] = vals
-
-        # Update legal values for all other cells in the same mini box that are not in the same row or col
-        width_mini = col // self.board.mini_box_width
-        height_mini = row // self.board.mini_box_height
-
-        for other_row in range(self.board.mini_box_height * height_mini, (self.board.mini_box_height + 1) * height_mini + 1):
-            for other_col in range(self.board.mini_box_width * width_mini, (self.board.mini_box_width + 1) * width_mini + 1):
-                if other_col != col and other_row != row:
-
-                    vals = self.board.get_legal_nums_for_cell(other_row, other_col)
-                    if len(vals) == 0:
-                        self.legal_values.pop((other_row, other_col), None)
-                    else:
-                        self.legal_values[(other_row, other_col)] = vals
+        # Update legal values for the current cell and for every cell sharing a unit with it.
+        # Empty cells with no legal values are kept with an empty list so that dead ends can be spotted
+        for cell in ((row, col),) + self.board.geometry.peer_coords[row * self.board.width + col]:
+            if self.board.cells[cell[0] * self.board.width + cell[1]] == 0:
+                self.legal_values[cell] = self.board.get_legal_nums_for_cell(*cell)
+            else:
+                self.legal_values.pop(cell, None)
 
 
 class MinimumRemainingValuesSolver(LegalValuesParent):
@@ -223,16 +662,26 @@ class MinimumRemainingValuesSolver(LegalValuesParent):
         super().__init__(board)
 
     def get_cell(self):
-        """Given the current state of the board, returns the (row, col) pair with the minimum remaining number of possible values"""
+        """
+        Given the current state of the board, returns the (row, col) pair with the minimum remaining number of possible values.
+        When randomized, ties are broken at random
+        """
         min_cell = self.board.ERROR, self.board.ERROR
         min_value = float('inf')
-        for cell in self.legal_values.keys():
-            if len(self.legal_values[cell]) < min_value:
-                min_value = len(self.legal_values[cell])
+        ties = []
+        for cell, values in self.legal_values.items():
+            if len(values) < min_value:
+                min_value = len(values)
                 min_cell = cell
-        check_row, check_col = self.board.find_empty_cell()
-        if min_cell[0] == self.board.ERROR and check_row != self.board.ERROR:
-            return check_row, check_col
+                ties = [cell]
+                if min_value == 0:  # A dead end, no cell can beat it
+                    break
+            elif len(values) == min_value and self.random is not None:
+                ties.append(cell)
+        if min_cell[0] == self.board.ERROR:
+            return self.board.find_empty_cell()
+        if len(ties) > 1:
+            return self.random.choice(ties)
         return min_cell
 
 
@@ -254,26 +703,12 @@ class LeastConstrainingValueSolver(LegalValuesParent):
         for num in legal_vals:
             count = 0
 
-            # Count the number of cells in the same row that this num can be placed in
-            for other_col in range(self.board.width):
-                if other_col != col and (row, other_col) in self.legal_values and num in self.legal_values[(row, other_col)]:  # If the number we are assigning to (row, col) could have been assigned to (row, other_col)
-                    count += 1
-
-            # Count the number of cells in the same column that this num can be placed in
-            for other_row in range(self.board.height):
-                if other_row != row and (other_row, col) in self.legal_values and num in self.legal_values[(other_row, col)]:  # If the number we are assigning to (row, col) could have been assigned to (other_row, col)
+            # Count the number of cells sharing a unit with (row, col) that this num could have been assigned to
+            for other_cell in self.board.geometry.peer_coords[row * self.board.width + col]:
+                if num in self.legal_values.get(other_cell, ()):
                     count += 1
 
-            # Count the number of cells in the same mini box that this num can be placed in
-            width_mini = col // self.board.mini_box_width
-            height_mini = row // self.board.mini_box_height
-
-            for other_row in range(self.board.mini_box_height * height_mini, (self.board.mini_box_height + 1) * height_mini + 1):
-                for other_col in range(self.board.mini_box_width * width_mini, (self.board.mini_box_width + 1) * width_mini + 1):
-                    if other_col != col and other_row != row and (other_row, other_col) in self.legal_values and num in self.legal_values[(other_row, other_col)]:  # If the number we are assigning to (row, col) could have been assigned to (other_row, other_col)
-                        count += 1
-
-            min_heap.push(num, count)
+            min_heap.push(num, count if self.random is None else (count, self.random.random()))
 
         return min_heap.get_sorted_list()
 
@@ -298,38 +733,21 @@ class ForwardCheckingSolver(LegalValuesParent):
     #             for _col in range(self.board.width):
     #                 if self.board.board[_row][_col] == 0 and (_row, _col) not in self.legal_values:
 
-    def solve_board_helper(self):
-        row, col = self.get_cell()
-        if row == self.board.ERROR:  # If there are no more empty cells
-            return True
-        for num in self.get_vals_for_cell(row, col):
-            if self.board.is_legal(row, col, num) and self.original_board.board[row][col] == 0:
-                if not self.do_move(row, col, num):
-                    continue
-                # print(f'Row={row}, Col={col}, Num={num}, Setting_num=True')
-
-                if self.solve_board_helper():
-                    return True
-
-                # print(f'Row={row}, Col={col}, Num={num}, Setting_num=False')
-                self.do_move(row, col, num, setting_num=False)
-
     def do_move(self, row, col, num, setting_num=True):
         if not setting_num:
             self.board.apply_move(row, col, 0)
+            self.update_legal_values(row, col, num, removing=False)
             self.record_step((row, col, 0))
         else:
             self.board.apply_move(row, col, num)
             self.update_legal_values(row, col, num, setting_num)
 
+            # Only the peers of (row, col) can have lost legal values, so only they need to be checked for a wipeout
             proceed = True
             if num != 0:
-                for _row in range(self.board.height):
-                    for _col in range(self.board.width):
-                        if self.board.board[_row][_col] == 0 and (_row, _col) not in self.legal_values:
-                            proceed = False
-                            break
-                    if not proceed:
+                for other_cell in self.board.geometry.peer_coords[row * self.board.width + col]:
+                    if self.legal_values.get(other_cell) == []:
+                        proceed = False
                         break
             if proceed:
                 self.record_step((row, col, num))
@@ -338,6 +756,13 @@ class ForwardCheckingSolver(LegalValuesParent):
                 self.update_legal_values(row, col, num, removing=False)
                 self.record_step((row, col, 0))
             return proceed
+
+    def explain_rejected_move(self, index, num, conflict):
+        """The move left a peer with no legal values, so num was the only one the peer had left"""
+        for peer in self.board.geometry.peers[index]:
+            if self.board.cells[peer] == 0 and self.board.get_candidate_mask(peer) == 1 << num:
+                return all(self.explain_blocked(peer, other, conflict) for other in self.board.valid_nums if other != num)
+        return False
     #
     # def get_vals_for_cell(self, row, col):
     #     if (row, col) not in self.legal_values:
@@ -380,6 +805,585 @@ class ForwardCheckingSolver(LegalValuesParent):
     #     return output
 
 
+class SatSolver(Solver):
+    """
+    This Solver encodes the board as a SAT problem and solves it with the CDCL engine.
+    There is one variable per (empty cell, legal num) pair, and clauses saying that every empty cell holds exactly
+    one num and every num missing from a unit appears in exactly one of the unit's cells. Clause learning and
+    non-chronological backjumping make it far better than the backtracking solvers on large boards with few clues.
+    Killer cages only forbid repeats and pairs of nums which no combination allows; a model breaking a cage's sum
+    is blocked with a new clause and the search goes on, which rarely takes more than a few rounds.
+    The number of nodes reported is the number of SAT decisions. The node limit and stop event are checked at every
+    restart of the CDCL engine rather than at every decision. When randomized, the engine breaks ties between
+    variables randomly and starts a few of them as true (see CDCL.randomize()), so every restart searches differently
+    """
+
+    RANDOM_TRUE_PHASE_PROBABILITY = 0.1
+
+    def __init__(self, board: Board):
+        super().__init__(board)
+        self.sat = None
+        self.variables = [None]  # variables[var] is the (cell index, num) pair the SAT variable stands for
+        self.var_of = dict()  # The inverse of self.variables
+        self.blocked = 0  # The number of models blocked for breaking a cage's sum
+
+    def encode(self):
+        """Builds the CDCL instance for the current board"""
+        geometry, cells = self.board.geometry, self.board.cells
+        var_of = self.var_of
+        candidates = dict()
+        for index, (row, col) in enumerate(geometry.cell_coords):
+            if cells[index] == 0:
+                candidates[index] = self.board.get_legal_nums_for_cell(row, col)
+                for num in candidates[index]:
+                    var_of[(index, num)] = len(self.variables)
+                    self.variables.append((index, num))
+
+        self.sat = CDCL(len(self.variables) - 1)
+        self.sat.stop = self.should_stop
+        if self.random is not None:
+            self.sat.randomize(self.random, SatSolver.RANDOM_TRUE_PHASE_PROBABILITY)
+        for index, nums in candidates.items():
+            self.add_exactly_one([var_of[(index, num)] for num in nums])
+        full_units = set(geometry.full_units)
+        for unit_index, unit in enumerate(geometry.units):
+            present = self.board.unit_masks[unit_index]
+            for num in self.board.valid_nums:
+                if not present >> num & 1:
+                    variables = [var_of[(index, num)] for index in unit if (index, num) in var_of]
+                    if unit_index in full_units:
+                        self.add_exactly_one(variables)
+                    else:  # A cage with fewer cells than nums need not hold every num
+                        self.add_at_most_one(variables)
+        for cage in geometry.cages:
+            self.add_cage_pairs(cage, candidates)
+
+    def add_cage_pairs(self, cage, candidates):
+        """Adds clauses forbidding every pair of moves in a cage which cannot be part of a combination with the right sum"""
+        present, subsets = self.board.unit_masks[cage], self.board.geometry.cage_subsets[cage]
+        empty = [index for index in self.board.geometry.units[cage] if index in candidates]
+        for i, index in enumerate(empty):
+            for other in empty[i + 1:]:
+                for num in candidates[index]:
+                    for other_num in candidates[other]:
+                        if num != other_num and present | 1 << num | 1 << other_num not in subsets:
+                            self.sat.add_clause([-self.var_of[(index, num)], -self.var_of[(other, other_num)]])
+
+    def block_broken_cages(self, model):
+        """
+        Adds a clause ruling out the moves of every cage whose sum the model breaks
+        :return: True iff a cage was broken
+        """
+        nums = {index: num for index, num in (self.variables[var] for var in model)}
+        broken = False
+        for cage, combos in self.board.geometry.cage_combinations.items():
+            cells = self.board.geometry.units[cage]
+            mask = self.board.unit_masks[cage]
+            for index in cells:
+                mask |= 1 << nums.get(index, 0)
+            if mask & ~1 not in combos:
+                self.sat.add_clause([-self.var_of[(index, nums[index])] for index in cells if index in nums])
+                self.blocked += 1
+                broken = True
+        return broken
+
+    def add_exactly_one(self, variables):
+        """Adds clauses saying that exactly one of the given variables is true"""
+        self.sat.add_clause(variables)
+        self.add_at_most_one(variables)
+
+    def add_at_most_one(self, variables):
+        """Adds clauses saying that at most one of the given variables is true"""
+        for i in range(len(variables)):
+            for j in range(i + 1, len(variables)):
+                self.sat.add_clause([-variables[i], -variables[j]])
+
+    def get_stats(self):
+        stats = super().get_stats()
+        if self.sat is not None:
+            stats.update(self.sat.get_stats())
+        if self.board.geometry.cages:
+            stats['blocked'] = self.blocked
+        return stats
+
+    def should_stop(self):
+        """Returns True once the search should stop, because of the node limit or the stop event. See CDCL.stop"""
+        return (self.node_limit is not None and self.sat.decisions > self.node_limit
+                or self.stop_event is not None and self.stop_event.is_set())
+
+    def find_model(self):
+        """
+        Runs the CDCL engine until it finds a model keeping every cage's sum. Returns the model, or None if there is none.
+        Raises NodeLimitReached or SearchStopped if the engine was stopped first
+        """
+        solved = self.sat.solve()
+        while solved and self.block_broken_cages(self.sat.get_model()):
+            solved = self.sat.solve()
+        self.nodes = self.sat.decisions
+        if solved is None:
+            if self.stop_event is not None and self.stop_event.is_set():
+                raise SearchStopped(self.nodes)
+            raise NodeLimitReached(self.nodes)
+        return self.sat.get_model() if solved else None
+
+    def count_solutions(self, limit=2):
+        """
+        Counts the solutions of the board, stopping once limit of them were found. Every model found is blocked with a
+        clause, so that the next one has to differ in at least one cell. The board itself is left unchanged
+        """
+        if self.board.conflicts:
+            return 0
+        self.encode()
+        count = 0
+        while count < limit:
+            model = self.find_model()
+            if model is None:
+                break
+            count += 1
+            self.sat.add_clause([-var for var in model])
+        return count
+
+    def solve_board_helper(self):
+        if self.board.conflicts:
+            return False
+        self.encode()
+        model = self.find_model()
+        if model is None:
+            return False
+        for var in sorted(model):
+            index, num = self.variables[var]
+            self.do_move(*divmod(index, self.board.width), num)
+        return True
+
+    def do_move(self, row, col, num, setting_num=True):
+        if not setting_num:
+            num = 0
+        self.board.apply_move(row, col, num)
+        self.record_step((row, col, num))
+
+
+def run_portfolio_strategy(solver_name, board, connection, node_limit=None):
+    """
+    Solves the board with a single strategy and sends the result back to the PortfolioSolver. Runs in a child process.
+    The solved flag sent is None if the strategy hit the node limit
+    """
+    solver = get_solver(solver_name, board)
+    solver.node_limit = node_limit
+    try:
+        solver.solve_board()
+        solved = solver.was_solved()
+    except NodeLimitReached:
+        solved = None
+    connection.send((solver_name, solved, bytes(solver.board.cells), solver.get_steps(), solver.get_nodes_explored()))
+    connection.close()
+
+
+class PortfolioSolver(Solver):
+    """
+    This Solver races several strategies against each other on the same board, each in its own process.
+    The first strategy to find a solution wins and the others are terminated. Since which strategy is fastest varies
+    wildly from board to board, this cuts the time spent on boards where a single fixed heuristic fails badly.
+    The winner of every race is recorded, and choose_strategies() uses those statistics to pick future portfolios.
+    With a node limit, every strategy may visit up to the limit, and NodeLimitReached is raised if none of them finishes
+    within it. The stop event is checked every POLL_INTERVAL seconds while waiting for the strategies
+    """
+
+    POLL_INTERVAL = 0.1  # Seconds
+
+    DEFAULT_STRATEGIES = [Solver.BACKTRACKING_SOLVER, Solver.MRV_SOLVER, Solver.LCV_SOLVER, Solver.FORWARD_CHECKING_SOLVER]
+
+    wins = Counter()  # The number of races each strategy has won
+    races = Counter()  # The number of races each strategy has taken part in
+
+    def __init__(self, board: Board, strategies=None, stats_path=None):
+        """
+        :param strategies: The names of the solvers to race. Defaults to choose_strategies()
+        :param stats_path: An optional JSON file to load the win statistics from and save them to after every race
+        """
+        super().__init__(board)
+        self.stats_path = stats_path
+        if stats_path:
+            PortfolioSolver.load_stats(stats_path)
+        self.strategies = strategies or PortfolioSolver.choose_strategies()
+        self.winner = None
+
+    @classmethod
+    def choose_strategies(cls, count=None):
+        """
+        Returns the names of the strategies to race, ordered by their win rate so far
+        :param count: The number of strategies to choose. Defaults to all of them
+        """
+        def win_rate(solver_name):
+            return (cls.wins[solver_name] + 1) / (cls.races[solver_name] + 2)  # Smoothed so new strategies get a fair chance
+
+        ranked = sorted(cls.DEFAULT_STRATEGIES, key=win_rate, reverse=True)
+        return ranked[:count] if count else ranked
+
+    @classmethod
+    def record_race(cls, strategies, winner):
+        """Records the outcome of a race. winner is None if no strategy found a solution"""
+        cls.races.update(strategies)
+        if winner is not None:
+            cls.wins[winner] += 1
+
+    @classmethod
+    def load_stats(cls, path):
+        """Loads the win statistics saved by save_stats(), if the file exists"""
+        if os.path.exists(path):
+            with open(path) as stats_file:
+                stats = json.load(stats_file)
+            cls.wins = Counter(stats['wins'])
+            cls.races = Counter(stats['races'])
+
+    @classmethod
+    def save_stats(cls, path):
+        """Saves the win statistics as JSON"""
+        with open(path, 'w') as stats_file:
+            json.dump({'wins': cls.wins, 'races': cls.races}, stats_file, indent=2)
+
+    def get_winner(self):
+        """Returns the name of the strategy which solved the board, or None"""
+        return self.winner
+
+    def get_stats(self):
+        stats = super().get_stats()
+        stats['winner'] = self.winner
+        return stats
+
+    def solve_board_helper(self):
+        # multiprocessing is imported here since it is slow to import, and most solvers never need it
+        import multiprocessing
+        from multiprocessing.connection import wait
+
+        processes, connections = [], []
+        for solver_name in self.strategies:
+            receiver, sender = multiprocessing.Pipe(duplex=False)
+            process = multiprocessing.Process(target=run_portfolio_strategy, daemon=True,
+                                              args=(solver_name, self.board, sender, self.node_limit))
+            process.start()
+            sender.close()  # Only the child holds the sending end, so a crashed child shows up as an EOFError
+            processes.append(process)
+            connections.append(receiver)
+
+        limit_reached = False
+        try:
+            pending = list(connections)
+            while pending and self.winner is None:
+                if self.stop_event is not None and self.stop_event.is_set():
+                    raise SearchStopped(self.nodes)
+                for connection in wait(pending, PortfolioSolver.POLL_INTERVAL):
+                    pending.remove(connection)
+                    try:
+                        solver_name, solved, cells, steps, nodes = connection.recv()
+                    except EOFError:
+                        continue
+                    self.nodes += nodes
+                    limit_reached |= solved is None
+                    if solved:
+                        self.winner = solver_name
+                        self.board.set_cells(cells)
+                        self.steps = steps
+                        break
+        finally:
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+                process.join()
+            for connection in connections:
+                connection.close()
+
+        PortfolioSolver.record_race(self.strategies, self.winner)
+        if self.stats_path:
+            PortfolioSolver.save_stats(self.stats_path)
+        if self.winner is None and limit_reached:
+            raise NodeLimitReached(self.nodes)
+        return self.winner is not None
+
+    def do_move(self, row, col, num, setting_num=True):
+        self.board.apply_move(row, col, num if setting_num else 0)
+
+
+def run_subproblem(solver_name, board, choice, node_limit):
+    """
+    Searches one subproblem of a ParallelSolver. Runs in a worker process
+    :param choice: If given, a (row, col, values) choice point: only those values of the cell are searched
+    :return: A (solved, cells, steps, frames, nodes) tuple, where solved is None if the search hit the node limit.
+             In that case frames holds the search's open choice points as (row, col, values, position) tuples,
+             outermost first, and the values after each position were never tried
+    """
+    solver = get_solver(solver_name, board)
+    solver.node_limit = node_limit
+    try:
+        solved = solver.search_values(*choice) if choice is not None else solver.solve_board_helper()
+    except NodeLimitReached:
+        return None, None, None, [tuple(frame) for frame in solver.trail], solver.get_nodes_explored()
+    if solved:
+        return True, bytes(solver.board.cells), solver.get_steps(), None, solver.get_nodes_explored()
+    return False, None, None, None, solver.get_nodes_explored()
+
+
+class ParallelSolver(Solver):
+    """
+    This Solver splits the search for a single board across a pool of worker processes.
+    The top levels of the search tree are expanded into independent subproblems, each a copy of the board with a few
+    more cells filled in, and the subproblems are queued on the pool. Idle workers take the next queued subproblem,
+    so the load balances itself no matter how uneven the subtrees are. A worker whose search visits more nodes than
+    the subproblem limit stops and hands back its unexplored frontier: the values it never tried at each of its open
+    choice points. Each of those becomes a new subproblem, so one huge subtree never keeps a single worker busy while
+    the others sit idle, and no part of it is searched twice. As soon as any worker finds a solution, the pool is
+    terminated. The stop event is checked every POLL_INTERVAL seconds while waiting for the workers
+    """
+
+    SPLIT_FACTOR = 4  # The number of subproblems kept queued per worker
+    MIN_NODE_LIMIT = 1000
+    POLL_INTERVAL = 0.1  # Seconds
+
+    def __init__(self, board: Board, solver_name=Solver.MRV_SOLVER, workers=None, node_limit=None):
+        """
+        :param solver_name: The name of the solver each worker runs on its subproblems. It must be one of
+                            CHECKPOINT_SOLVERS, whose searches keep their open choice points, so that a worker can
+                            hand back its frontier. Otherwise a ValueError is raised
+        :param workers: The number of worker processes. Defaults to the number of CPUs
+        :param node_limit: The number of nodes a worker may visit in one subproblem. Defaults to ten times the
+                           number of empty cells
+        """
+        super().__init__(board)
+        if solver_name not in CHECKPOINT_SOLVERS:
+            raise ValueError(f'The {solver_name} solver cannot hand back its frontier, so it cannot be run in parallel')
+        self.solver_name = solver_name
+        self.workers = workers or os.cpu_count() or 1
+        self.subproblem_limit = node_limit or max(ParallelSolver.MIN_NODE_LIMIT, 10 * board.empty_cells)
+        self.subproblems = 0  # The number of subproblems sent to the workers
+        self.splits = 0  # The number of subproblems which hit the node limit and had their frontier queued
+
+    def get_stats(self):
+        stats = super().get_stats()
+        stats['subproblems'] = self.subproblems
+        stats['splits'] = self.splits
+        return stats
+
+    def split(self, board, steps, choice):
+        """
+        Expands one node of the search tree by filling a cell in every legal way
+        :param steps: The moves which lead from the original board to this board
+        :param choice: A (row, col, values) choice point to expand, or None to fill the empty cell with the fewest
+                       legal nums
+        :return: A list of (board, steps, None) subproblems, one per child. Empty if the board is a dead end
+        """
+        self.count_node()
+        if choice is not None:
+            row, col, values = choice
+            cell, nums = (row, col), [num for num in values if board.is_legal(row, col, num)]
+        else:
+            cell, nums = None, None
+            for index, (row, col) in enumerate(board.geometry.cell_coords):
+                if board.cells[index] == 0:
+                    legal = board.get_legal_nums_for_cell(row, col)
+                    if nums is None or len(legal) < len(nums):
+                        cell, nums = (row, col), legal
+                        if len(nums) <= 1:
+                            break
+        children = []
+        for num in nums:
+            child = deepcopy(board)
+            child.apply_move(*cell, num)
+            children.append((child, steps + [(*cell, num)], None))
+        return children
+
+    def expand(self, frontier, size):
+        """
+        Splits the subproblems at the front of the frontier until it holds at least size subproblems
+        :return: The (board, steps) pair of a solved subproblem if one is found on the way, otherwise None
+        """
+        while frontier and len(frontier) < size:
+            board, steps, choice = frontier.popleft()
+            if choice is None and board.empty_cells == 0:
+                return board, steps
+            frontier.extend(self.split(board, steps, choice))
+        return None
+
+    @staticmethod
+    def get_frontier(board, steps, frames):
+        """
+        Turns the open choice points of a search which hit its node limit into new subproblems
+        :param board: The board the search started from
+        :param frames: The search's open choice points as (row, col, values, position) tuples, outermost first.
+                       The value at each position is on the board below it, the values after it were never tried
+        :return: A list of (board, steps, (row, col, values)) subproblems, one per choice point with untried values
+        """
+        subproblems = []
+        board, steps = deepcopy(board), list(steps)
+        for row, col, values, position in frames:
+            if position + 1 < len(values):
+                subproblems.append((deepcopy(board), list(steps), (row, col, values[position + 1:])))
+            board.apply_move(row, col, values[position])
+            steps.append((row, col, values[position]))
+        return subproblems
+
+    def solve_board_helper(self):
+        import multiprocessing  # See PortfolioSolver.solve_board_helper()
+
+        if self.board.conflicts:
+            return False
+        frontier = deque([(self.board, [], None)])
+        results = queue.Queue()
+        pending = 0
+        pool = multiprocessing.Pool(self.workers)
+        try:
+            while True:
+                solution = self.expand(frontier, self.workers * ParallelSolver.SPLIT_FACTOR - pending)
+                if solution is not None:
+                    board, self.steps = solution
+                    self.board.set_cells(board.cells)
+                    return True
+                while frontier:
+                    subproblem = board, steps, choice = frontier.popleft()
+                    pool.apply_async(run_subproblem, (self.solver_name, board, choice, self.subproblem_limit),
+                                     callback=lambda result, subproblem=subproblem: results.put((subproblem, result)),
+                                     error_callback=lambda error, subproblem=subproblem: results.put((subproblem, error)))
+                    pending += 1
+                    self.subproblems += 1
+                if pending == 0:  # Every subproblem was searched without finding a solution
+                    return False
+
+                try:
+                    (board, steps, choice), result = results.get(timeout=ParallelSolver.POLL_INTERVAL)
+                except queue.Empty:
+                    if self.stop_event is not None and self.stop_event.is_set():
+                        raise SearchStopped(self.nodes)
+                    continue
+                pending -= 1
+                if isinstance(result, BaseException):
+                    raise result
+                solved, cells, worker_steps, frames, nodes = result
+                self.nodes += nodes
+                if solved:
+                    self.board.set_cells(cells)
+                    self.steps = steps + worker_steps
+                    return True
+                if solved is None:  # The subtree is too big for one worker, so share out what it did not search
+                    self.splits += 1
+                    frontier.extend(ParallelSolver.get_frontier(board, steps, frames))
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def do_move(self, row, col, num, setting_num=True):
+        self.board.apply_move(row, col, num if setting_num else 0)
+
+
+def luby(index):
+    """Returns the index'th (0-based) term of the Luby sequence: 1, 1, 2, 1, 1, 2, 4, 1, 1, 2, 1, 1, 2, 4, 8, ..."""
+    index += 1
+    while True:
+        power = 2
+        while power - 1 < index:  # Find the smallest 2^k - 1 >= index
+            power *= 2
+        if power - 1 == index:
+            return power // 2
+        index -= power // 2 - 1  # Otherwise the term repeats an earlier part of the sequence
+
+
+class RestartingSolver(Solver):
+    """
+    This Solver runs another solver with randomized tie-breaking, and restarts it from scratch with a new random
+    order whenever it visits more nodes than the restart schedule allows. Unlucky early choices can make a
+    deterministic search take orders of magnitude longer on some boards; restarting cuts those runs short instead of
+    waiting them out. The node limits follow either the Luby sequence or a geometric series, both of which keep
+    growing, so the search is still guaranteed to finish. The solver's own node limit caps the nodes of all of the
+    runs together, and its stop event is passed on to every run
+    """
+
+    LUBY = 'luby'
+    GEOMETRIC = 'geometric'
+
+    MIN_BASE_LIMIT = 100
+    DEFAULT_GROWTH = 1.5
+
+    def __init__(self, board: Board, solver_name=Solver.MRV_SOLVER, seed=None, schedule=LUBY,
+                 base_limit=None, growth=DEFAULT_GROWTH, learning=False):
+        """
+        :param solver_name: The name of the solver to restart
+        :param seed: Seeds the random tie-breaking so that runs are reproducible
+        :param schedule: RestartingSolver.LUBY or RestartingSolver.GEOMETRIC
+        :param base_limit: The node limit of the first run. Luby limits are multiples of it. Defaults to twice the
+                           number of empty cells, since a run cannot finish in fewer nodes than that
+        :param growth: The factor the node limit grows by after every geometric restart
+        :param learning: If True, the runs share a transposition table and nogoods (see Solver.enable_learning()),
+                         so dead ends found before a restart are not explored again
+        """
+        super().__init__(board)
+        self.solver_name = solver_name
+        self.random = Random(seed)
+        self.schedule = schedule
+        self.base_limit = base_limit or max(RestartingSolver.MIN_BASE_LIMIT, 2 * board.empty_cells)
+        self.growth = growth
+        self.restarts = 0
+        if learning:
+            self.transposition_table = TranspositionTable()
+            self.nogoods = NogoodStore()
+
+    def get_node_limit(self, restart):
+        """Returns the node limit of the run after the given number of restarts"""
+        if self.schedule == RestartingSolver.LUBY:
+            return self.base_limit * luby(restart)
+        return int(self.base_limit * self.growth ** restart)
+
+    def get_stats(self):
+        stats = super().get_stats()
+        stats['restarts'] = self.restarts
+        if self.transposition_table is not None:
+            stats['tt_hit_rate'] = self.transposition_table.get_hit_rate()
+            stats['nogoods'] = len(self.nogoods.nogoods)
+        return stats
+
+    def solve_board_helper(self):
+        while True:
+            node_limit = self.get_node_limit(self.restarts)
+            if self.node_limit is not None:
+                if self.nodes >= self.node_limit:
+                    raise NodeLimitReached(self.nodes)
+                node_limit = min(node_limit, self.node_limit - self.nodes)
+            solver = get_solver(self.solver_name, deepcopy(self.board))
+            solver.randomize(self.random)
+            solver.node_limit = node_limit
+            solver.stop_event = self.stop_event
+            if self.transposition_table is not None:
+                solver.enable_learning(self.transposition_table, self.nogoods)
+            try:
+                solved = solver.solve_board_helper()
+            except NodeLimitReached:
+                self.restarts += 1
+                continue
+            finally:
+                self.nodes += solver.get_nodes_explored()
+            if solved:
+                self.board.set_cells(solver.board.cells)
+                self.steps = solver.get_steps()  # Only the last run's steps, which start from the original board
+            return solved
+
+    def do_move(self, row, col, num, setting_num=True):
+        self.board.apply_move(row, col, num if setting_num else 0)
+
+
+class StoredSolver(Solver):
+    """
+    Stands in for the solver which found a solution loaded from a SolutionStore (see Solver.load_solution()).
+    It skips all of a real solver's search setup, so that a stored solution costs no more than its lookup,
+    and it never searches: solve_board() only reports whether a solution was loaded
+    """
+
+    def __init__(self, board: Board, solver_name):
+        super().__init__(board)
+        self.solver_name = solver_name  # The name of the solver which found the solution
+
+    def solve_board_helper(self):
+        return self.solved
+
+    def do_move(self, row, col, num, setting_num=True):
+        self.board.apply_move(row, col, num if setting_num else 0)
+
+
 def get_solver(solver_name, board):
     """Given the string input representing the name of the solver, return the Solver object"""
     if solver_name == Solver.BACKTRACKING_SOLVER:
@@ -390,6 +1394,113 @@ def get_solver(solver_name, board):
         return LeastConstrainingValueSolver(board)
     elif solver_name == Solver.FORWARD_CHECKING_SOLVER:
         return ForwardCheckingSolver(board)
+    elif solver_name == Solver.PORTFOLIO_SOLVER:
+        return PortfolioSolver(board)
+    elif solver_name == Solver.RESTARTING_SOLVER:
+        return RestartingSolver(board)
+    elif solver_name == Solver.SAT_SOLVER:
+        return SatSolver(board)
+    elif solver_name == Solver.PARALLEL_SOLVER:
+        return ParallelSolver(board)
+
+
+# Maps the name of every solver which can be resumed from a checkpoint to its class
+CHECKPOINT_SOLVERS = {
+    Solver.BACKTRACKING_SOLVER: BacktrackingSolver,
+    Solver.MRV_SOLVER: MinimumRemainingValuesSolver,
+    Solver.LCV_SOLVER: LeastConstrainingValueSolver,
+    Solver.FORWARD_CHECKING_SOLVER: ForwardCheckingSolver,
+}
+
+
+def resume_solver(path):
+    """
+    Rebuilds the Solver whose search state was saved to the given checkpoint file (see Solver.enable_checkpoints()).
+    Calling solve_board() on it continues the search exactly where the checkpoint was taken
+    """
+    state = Checkpoint.read(path)
+    solver_classes = {solver_class.__name__: solver_class for solver_class in CHECKPOINT_SOLVERS.values()}
+    if state.solver_class not in solver_classes:
+        raise ValueError(f'{path} holds the state of a {state.solver_class}, which cannot be resumed')
+    board = Board.from_cells(state.initial_cells, state.geometry)
+    board.set_cells(state.start_cells)
+    solver = solver_classes[state.solver_class](board)
+    solver.restore_checkpoint_state(state)
+    return solver
+
+
+def solve_batch(boards, solver_name, store=None):
+    """
+    Solves every board in the given iterable, e.g. a CorpusReader or a slice of one, one board at a time.
+    The boards are solved in place
+    :param store: An optional SolutionStore. Boards whose solution is stored are not searched again
+    :return: A generator of solved Solver objects, in the same order as the boards
+    """
+    for board in boards:
+        if store is not None:
+            yield store.solve(solver_name, board)
+            continue
+        solver = get_solver(solver_name, board)
+        solver.solve_board()
+        yield solver
+
+
+class SolverCache:
+    """
+    Keeps solved Solver objects around so that the same board is never solved twice by the same solver.
+    Entries are keyed by the solver's name, the board's shared Geometry (so variants never share entries with
+    plain boards) and the layout of the board before it was solved.
+    The cache is thread safe, so a solution can be computed in the background and picked up later
+    """
+
+    MAX_SIZE = 64
+
+    def __init__(self, max_size=MAX_SIZE):
+        self.max_size = max_size
+        self.solvers = OrderedDict()
+        self.lock = Lock()
+
+    @staticmethod
+    def get_key(solver_name, board):
+        """Returns the key used to store the given board's solution"""
+        return solver_name, board.geometry, bytes(board.cells)
+
+    def get(self, solver_name, board):
+        """Returns the solved Solver object for the given board, or None if it has not been solved yet"""
+        key = SolverCache.get_key(solver_name, board)
+        with self.lock:
+            solver = self.solvers.get(key)
+            if solver is not None:
+                self.solvers.move_to_end(key)
+            return solver
+
+    def put(self, solver_name, solver):
+        """Stores a Solver object which has already run solve_board()"""
+        key = SolverCache.get_key(solver_name, solver.original_board)
+        with self.lock:
+            self.solvers[key] = solver
+            self.solvers.move_to_end(key)
+            while len(self.solvers) > self.max_size:
+                self.solvers.popitem(last=False)
+
+    def solve(self, solver_name, board, stop_event=None):
+        """
+        Returns a solved Solver object for the given board, solving a copy of the board only if no cached result exists.
+        The given board is left untouched
+        :param stop_event: An optional threading.Event which stops the search when set, by raising SearchStopped.
+                           A stopped search is not cached
+        """
+        solver = self.get(solver_name, board)
+        if solver is None:
+            solver = get_solver(solver_name, deepcopy(board))
+            solver.stop_event = stop_event
+            solver.solve_board()
+            solver.stop_event = None
+            self.put(solver_name, solver)
+        return solver
+
+
+solver_cache = SolverCache()
 
 
 if __name__ == '__main__':